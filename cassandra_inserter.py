@@ -1,43 +1,20 @@
 from cassandra.cluster import Cluster
-import csv
+import cassandra_loader
+import cassandra_schema
+
+# Concurrency level and UNLOGGED batch size (0 = no batching) for the loader
+concurrency = 100
+batch_size = 0
 
 def insert_data():
     # Connect to the Cassandra cluster on localhost
     cluster = Cluster(['127.0.0.1'])
-    session = cluster.connect('library')
-
-    # Insert Books
-    with open('books.csv', 'r') as csvfile:
-        next(csvfile)  # Skip header
-        reader = csv.reader(csvfile)
-        for row in reader:
-            query = """
-                INSERT INTO books (book_id, title, author, year, genre)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            session.execute(query, (int(row[0]), row[1], row[2], int(row[3]), row[4]))
-
-    # Insert Borrowers
-    with open('borrowers.csv', 'r') as csvfile:
-        next(csvfile)
-        reader = csv.reader(csvfile)
-        for row in reader:
-            query = """
-                INSERT INTO borrowers (borrower_id, name, email)
-                VALUES (%s, %s, %s)
-            """
-            session.execute(query, (int(row[0]), row[1], row[2]))
+    session = cluster.connect()
+    cassandra_schema.create_schema(session)
 
-    # Insert Transactions
-    with open('transactions.csv', 'r') as csvfile:
-        next(csvfile)
-        reader = csv.reader(csvfile)
-        for row in reader:
-            query = """
-                INSERT INTO transactions (transaction_id, book_id, borrower_id, borrow_date, return_date)
-                VALUES (%s, %s, %s, %s, %s)
-            """
-            session.execute(query, (int(row[0]), int(row[1]), int(row[2]), row[3], row[4]))
+    # Insert Books, Borrowers and Transactions (and the query tables derived from them)
+    # with prepared statements executed concurrently
+    cassandra_loader.load_dataset(session, concurrency=concurrency, batch_size=batch_size, truncate=False)
 
     cluster.shutdown()
 
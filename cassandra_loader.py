@@ -0,0 +1,251 @@
+import time
+from collections import defaultdict
+
+from cassandra.concurrent import execute_concurrent, execute_concurrent_with_args
+from cassandra.query import BatchStatement, BatchType
+
+from cassandra_schema import COUNTER_TABLES, QUERY_TABLES, name_prefix, year_month
+from columnar import TABLE_SCHEMAS, load_rows
+
+# In-flight requests per table load; raise until the node's write latency starts to climb.
+CONCURRENCY = 100
+
+# Rows per UNLOGGED batch when batching is enabled (0 = one INSERT per row).
+BATCH_SIZE = 0
+
+TABLES = ["books", "borrowers", "transactions"]
+
+
+def columns_of(table):
+    return [name for name, _ in TABLE_SCHEMAS[table]]
+
+
+def prepare_insert(session, table, columns=None):
+    columns = columns or columns_of(table)
+    return session.prepare(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+    )
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+class LatencyRecorder:
+    """
+    Records the latency of every request sent through a session, using the driver's
+    request-init listener hook, so it also covers requests issued by execute_concurrent.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.samples = []
+
+    def _on_request(self, response_future):
+        start = time.perf_counter()
+        response_future.add_callbacks(self._done, self._done, callback_args=(start,), errback_args=(start,))
+
+    def _done(self, _result, start):
+        self.samples.append((time.perf_counter() - start) * 1000)
+
+    def summary(self):
+        values = sorted(self.samples)
+        return {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": values[-1] if values else 0.0,
+        }
+
+    def __enter__(self):
+        self.session.add_request_init_listener(self._on_request)
+        return self
+
+    def __exit__(self, *exc):
+        self.session.remove_request_init_listener(self._on_request)
+
+
+def replica_key(session, bound):
+    """
+    Grouping key for unlogged_batches: the replica set owning the statement's partition (the
+    routing key itself when the driver has no token metadata), so a batch never spans replica sets.
+    """
+    replicas = session.cluster.metadata.get_replicas(session.keyspace, bound.routing_key)
+    return tuple(sorted(str(host.endpoint) for host in replicas)) or bound.routing_key
+
+
+def unlogged_batches(session, prepared, rows, batch_size):
+    """
+    Yields (BatchStatement, None) pairs of at most batch_size rows. Rows are grouped by the replica
+    set owning their partition, not by partition: one replica set owns many partitions, so these
+    are still multi-partition UNLOGGED batches. They are only coordinator-local, i.e. every
+    partition in a batch lives on the replicas that token-aware routing sends it to, so the
+    coordinator does not forward writes to other nodes. No batchlog is involved.
+    """
+    pending = defaultdict(list)
+    for row in rows:
+        bound = prepared.bind(row)
+        group = pending[replica_key(session, bound)]
+        group.append(bound)
+        if len(group) >= batch_size:
+            yield _batch_of(group), None
+            group.clear()
+    for group in pending.values():
+        if group:
+            yield _batch_of(group), None
+
+
+def _batch_of(statements):
+    batch = BatchStatement(batch_type=BatchType.UNLOGGED)
+    for statement in statements:
+        batch.add(statement)
+    return batch
+
+
+def _rows_of(stem, table):
+    for batch in load_rows(stem, table=table):
+        yield from batch
+
+
+def write_rows(session, prepared, rows, concurrency=CONCURRENCY, batch_size=BATCH_SIZE):
+    """Executes prepared for every row, either individually or grouped into UNLOGGED batches."""
+    if batch_size > 0:
+        results = execute_concurrent(session, unlogged_batches(session, prepared, rows, batch_size),
+                                     concurrency=concurrency, raise_on_first_error=True, results_generator=True)
+    else:
+        results = execute_concurrent_with_args(session, prepared, rows, concurrency=concurrency,
+                                               raise_on_first_error=True, results_generator=True)
+    # The generator drives the requests; draining it waits for every write to finish.
+    for _ in results:
+        pass
+
+
+def load_table(session, table, stem, concurrency=CONCURRENCY, batch_size=BATCH_SIZE):
+    """
+    Loads one table with a prepared INSERT and reports rows/s and request latency percentiles.
+    Returns (rows, seconds, latency_summary).
+    """
+    return insert_rows(session, table, columns_of(table), _rows_of(stem, table), stem, concurrency, batch_size)
+
+
+def insert_rows(session, table, columns, rows, source, concurrency=CONCURRENCY, batch_size=BATCH_SIZE):
+    """Writes rows (tuples in columns order) into table; source only labels the report."""
+    prepared = prepare_insert(session, table, columns)
+    counter = [0]
+
+    def counted(rows):
+        for row in rows:
+            counter[0] += 1
+            yield row
+
+    start = time.time()
+    with LatencyRecorder(session) as recorder:
+        write_rows(session, prepared, counted(rows), concurrency, batch_size)
+    elapsed = time.time() - start
+    rows = counter[0]
+    latency = recorder.summary()
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{table}: {rows} rows from {source} in {elapsed:.2f} s ({rate:.0f} rows/s, "
+          f"{latency['count']} requests, p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, "
+          f"p99 {latency['p99']:.2f} ms)")
+    return rows, elapsed, latency
+
+
+# --- Query tables (see cassandra_schema.QUERY_TABLES) ---
+# Each builder yields the rows of one query table, derived from the same source files.
+
+def transactions_by_borrower_rows(stems):
+    books = {book_id: (genre, title)
+             for book_id, title, _, _, genre in _rows_of(stems["books"], "books")}
+    for row in _rows_of(stems["transactions"], "transactions"):
+        transaction_id, book_id, borrower_id, borrow_date, return_date = row
+        genre, title = books.get(book_id, (None, None))
+        yield borrower_id, borrow_date, transaction_id, book_id, genre, title, return_date
+
+
+def borrowers_by_name_prefix_rows(stems):
+    for borrower_id, name, _ in _rows_of(stems["borrowers"], "borrowers"):
+        yield name_prefix(name), name.lower(), borrower_id, name
+
+
+def transactions_by_month_rows(stems):
+    for row in _rows_of(stems["transactions"], "transactions"):
+        transaction_id, book_id, borrower_id, borrow_date, return_date = row
+        yield year_month(borrow_date), borrow_date, transaction_id, borrower_id, book_id, return_date
+
+
+query_table_builders = {
+    "transactions_by_borrower": (
+        ["borrower_id", "borrow_date", "transaction_id", "book_id", "genre", "title", "return_date"],
+        transactions_by_borrower_rows,
+    ),
+    "borrowers_by_name_prefix": (
+        ["prefix", "name_lower", "borrower_id", "name"],
+        borrowers_by_name_prefix_rows,
+    ),
+    "transactions_by_month": (
+        ["year_month", "borrow_date", "transaction_id", "borrower_id", "book_id", "return_date"],
+        transactions_by_month_rows,
+    ),
+}
+
+
+def load_query_tables(session, stems, concurrency=CONCURRENCY, batch_size=BATCH_SIZE):
+    stats = {}
+    for table in QUERY_TABLES:
+        columns, build = query_table_builders[table]
+        stats[table] = insert_rows(session, table, columns, build(stems), ", ".join(stems.values()),
+                                   concurrency, batch_size)
+    return stats
+
+
+def load_borrow_counts(session, stems, concurrency=CONCURRENCY):
+    """
+    Adds each book's transaction count to book_borrow_counts, one counter UPDATE per book.
+    Counter updates are not idempotent, so the table must be empty (load_dataset truncates it).
+    Returns (rows, seconds, latency_summary).
+    """
+    counts = {}
+    for _, book_id, _, _, _ in _rows_of(stems["transactions"], "transactions"):
+        counts[book_id] = counts.get(book_id, 0) + 1
+    update = session.prepare("UPDATE book_borrow_counts SET borrow_count = borrow_count + ? WHERE book_id = ?")
+    start = time.time()
+    with LatencyRecorder(session) as recorder:
+        # Counter updates cannot go into UNLOGGED batches, so they are always sent one by one.
+        write_rows(session, update, ((count, book_id) for book_id, count in counts.items()), concurrency, 0)
+    elapsed = time.time() - start
+    latency = recorder.summary()
+    print(f"book_borrow_counts: {len(counts)} counters from {stems['transactions']} in {elapsed:.2f} s "
+          f"(p50 {latency['p50']:.2f} ms, p95 {latency['p95']:.2f} ms, p99 {latency['p99']:.2f} ms)")
+    return len(counts), elapsed, latency
+
+
+def load_dataset(session, suffix=None, concurrency=CONCURRENCY, batch_size=BATCH_SIZE, truncate=True,
+                 query_tables=True):
+    """
+    Loads books, borrowers and transactions from <table>_<suffix> (or <table> when suffix is None),
+    then, with query_tables, the denormalized query tables and counters derived from them.
+    INSERTs are upserts, so with truncate=False the tables can be reloaded in place; the counter
+    tables are truncated either way, since counting the same transactions again would add them twice.
+    Returns {table: (rows, seconds, latency_summary)}.
+    """
+    tables = TABLES + (list(QUERY_TABLES) if query_tables else [])
+    if truncate:
+        for table in tables:
+            session.execute(f"TRUNCATE {table};")
+        print("Tables truncated.")
+    if query_tables:
+        for table in COUNTER_TABLES:
+            session.execute(f"TRUNCATE {table};")
+    stems = {table: f"{table}_{suffix}" if suffix else table for table in TABLES}
+    stats = {}
+    for table in TABLES:
+        stats[table] = load_table(session, table, stems[table], concurrency, batch_size)
+    if query_tables:
+        stats.update(load_query_tables(session, stems, concurrency, batch_size))
+        stats["book_borrow_counts"] = load_borrow_counts(session, stems, concurrency)
+    return stats
@@ -1,7 +1,13 @@
-from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.util import Date
+import datetime
 import time
 import statistics
-import csv
+import cassandra_loader
+import connections
+import consumption
+import cassandra_scan
+import cassandra_schema
 
 # Set this variable manually based on the desired dataset size:
 # "250k" for 25%, "500k" for 50%, "750k" for 75%, "1000k" for 100%
@@ -15,73 +21,76 @@ csv_mapping = {
     "1000k": "100"
 }
 
+# Loader settings: in-flight INSERTs, and rows per replica-grouped UNLOGGED batch (0 = no batching)
+load_concurrency = 100
+load_batch_size = 0
+
+# "sync" runs every partition read one after another; "async" loads the books dimension once per query,
+# fans the per-borrower reads out with at most query_concurrency requests in flight, and joins in memory
+execution_mode = "sync"
+query_concurrency = 100
+
+# How Query3 counts borrows per book: "scan" (one full-table SELECT through a single coordinator),
+# "token_scan" (scan_splits token ranges, scan_concurrency at a time, scan_fetch_size rows per page, partial
+# counts merged) or "counter" (read the book_borrow_counts counters maintained by the loader)
+query3_strategy = "scan"
+scan_splits = 32
+scan_concurrency = 8
+scan_fetch_size = 5000
+
+# How Query4 finds borrowers active since 2022-01-01: "borrower" (read every borrower's partition) or
+# "month" (read only the transactions_by_month buckets covering the date range, in parallel, then the
+# partitions of the qualifying borrowers)
+query4_strategy = "borrower"
+
+# Query4 result consumption compared after the timed runs (see consumption.py): "materialize" builds
+# the whole history list, as the timed runs do; "stream" walks the rows as they are produced, with
+# the borrowers scan paged stream_fetch_size rows at a time (sync Query4), or the eligible borrowers'
+# names and histories read query_concurrency borrowers at a time (month Query4; the month buckets
+# are still all counted before the first row). Peak client memory is traced per mode
+# (consumption.traced_peak_mb).
+consumption_modes = ["stream", "materialize"]
+stream_fetch_size = 1000
+
 def load_data_from_csv(dataset_size, session):
     """
     Clears Cassandra tables and loads data from CSV subset files based on the given dataset size.
     Expected CSV files: books_<suffix>.csv, borrowers_<suffix>.csv, transactions_<suffix>.csv
+    Rows are written with prepared INSERTs through cassandra_loader (see load_concurrency / load_batch_size),
+    which also fills the query tables the queries below read from.
     """
     suffix = csv_mapping.get(dataset_size, "25")
-    books_file = f"books_{suffix}.csv"
-    borrowers_file = f"borrowers_{suffix}.csv"
-    transactions_file = f"transactions_{suffix}.csv"
-    
-    # Clear existing data using TRUNCATE
-    session.execute("TRUNCATE books;")
-    session.execute("TRUNCATE borrowers;")
-    session.execute("TRUNCATE transactions;")
-    print("Tables truncated.")
-    
-    # Load Books
-    with open(books_file, 'r') as f:
-        next(f)  # skip header
-        reader = csv.reader(f)
-        for row in reader:
-            session.execute(
-                """
-                INSERT INTO books (book_id, title, author, year, genre)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (int(row[0]), row[1], row[2], int(row[3]), row[4])
-            )
-    print(f"Books inserted successfully from {books_file}.")
-    
-    # Load Borrowers
-    with open(borrowers_file, 'r') as f:
-        next(f)
-        reader = csv.reader(f)
-        for row in reader:
-            session.execute(
-                """
-                INSERT INTO borrowers (borrower_id, name, email)
-                VALUES (%s, %s, %s)
-                """,
-                (int(row[0]), row[1], row[2])
-            )
-    print(f"Borrowers inserted successfully from {borrowers_file}.")
-    
-    # Load Transactions
-    with open(transactions_file, 'r') as f:
-        next(f)
-        reader = csv.reader(f)
-        for row in reader:
-            session.execute(
-                """
-                INSERT INTO transactions (transaction_id, book_id, borrower_id, borrow_date, return_date)
-                VALUES (%s, %s, %s, %s, %s)
-                """,
-                (int(row[0]), int(row[1]), int(row[2]), row[3], row[4])
-            )
-    print(f"Transactions inserted successfully from {transactions_file}.")
+    cassandra_loader.load_dataset(session, suffix, concurrency=load_concurrency, batch_size=load_batch_size)
 
 # --- Query Functions for Cassandra ---
+# The queries read the query tables from cassandra_schema: every lookup is a single-partition read,
+# and none of them needs ALLOW FILTERING. Every statement, including the parameterless scans, is
+# prepared once per session and then only executed with bound values.
+
+_prepared = {}
+
+def prepared(session, cql):
+    """Prepares cql once per session and reuses the statement afterwards."""
+    key = (id(session), cql)
+    if key not in _prepared:
+        _prepared[key] = session.prepare(cql)
+    return _prepared[key]
 
 # Modified Query1: Return all borrowers whose names start with a given pattern.
 def query1(session, name_pattern):
     print("Running Query1...")
-    # Fetch all borrowers (using ALLOW FILTERING for simplicity)
-    rows = session.execute("SELECT borrower_id, name FROM borrowers ALLOW FILTERING;")
-    # Filter in Python for names starting with the pattern (case-insensitive)
-    matching = [row.name for row in rows if row.name.lower().startswith(name_pattern.lower())]
+    lower, upper = cassandra_schema.prefix_range(name_pattern)
+    if len(lower) >= cassandra_schema.PREFIX_LENGTH:
+        # One partition, and only the clustering range of names starting with the pattern
+        rows = session.execute(
+            prepared(session, "SELECT name FROM borrowers_by_name_prefix "
+                              "WHERE prefix = ? AND name_lower >= ? AND name_lower < ?;"),
+            (cassandra_schema.name_prefix(name_pattern), lower, upper))
+        matching = [row.name for row in rows]
+    else:
+        # Pattern shorter than the partition prefix: every partition can match
+        rows = session.execute(prepared(session, "SELECT name, name_lower FROM borrowers_by_name_prefix;"))
+        matching = [row.name for row in rows if row.name_lower.startswith(lower)]
     matching_sorted = sorted(matching)
     print(f"Query1 completed: found {len(matching_sorted)} matching borrowers.")
     return matching_sorted
@@ -89,69 +98,207 @@ def query1(session, name_pattern):
 def query2(session):
     print("Running Query2...")
     results = []
-    rows = session.execute("SELECT borrower_id, name FROM borrowers ALLOW FILTERING;")
+    history = prepared(session, "SELECT genre FROM transactions_by_borrower WHERE borrower_id = ?;")
+    rows = session.execute(prepared(session, "SELECT borrower_id, name FROM borrowers;"))
     for row in rows:
-        borrower_id = row.borrower_id
-        name = row.name
-        rows2 = session.execute(f"SELECT book_id FROM transactions WHERE borrower_id = {borrower_id} ALLOW FILTERING;")
-        count = 0
-        for r in rows2:
-            row3 = session.execute(f"SELECT genre FROM books WHERE book_id = {r.book_id} ALLOW FILTERING;").one()
-            if row3 and row3.genre == "Fiction":
-                count += 1
-        results.append((name, count))
+        count = sum(1 for t in session.execute(history, (row.borrower_id,)) if t.genre == "Fiction")
+        results.append((row.name, count))
     print(f"Query2 completed: processed {len(results)} borrowers.")
     return results
 
-def query3(session):
-    print("Running Query3...")
-    rows = session.execute("SELECT book_id FROM transactions ALLOW FILTERING;")
+def book_counts(session):
+    """book_id -> number of transactions, computed with the configured query3_strategy."""
+    if query3_strategy == "counter":
+        rows = session.execute(prepared(session, "SELECT book_id, borrow_count FROM book_borrow_counts;"))
+        return {row.book_id: row.borrow_count for row in rows}
+    if query3_strategy == "token_scan":
+        statement = prepared(session, cassandra_scan.range_query("transactions", "transaction_id", ["book_id"]))
+        return cassandra_scan.count_by(session, statement, "book_id", splits=scan_splits,
+                                       concurrency=scan_concurrency, fetch_size=scan_fetch_size)
     freq = {}
-    for row in rows:
+    for row in session.execute(prepared(session, "SELECT book_id FROM transactions;")):
         freq[row.book_id] = freq.get(row.book_id, 0) + 1
+    return freq
+
+def query3(session):
+    print("Running Query3...")
+    freq = book_counts(session)
     top5 = sorted(freq.items(), key=lambda x: x[1], reverse=True)[:5]
+    title_of = prepared(session, "SELECT title FROM books WHERE book_id = ?;")
     top5_titles = []
     for book_id, count in top5:
-        row = session.execute(f"SELECT title FROM books WHERE book_id = {book_id} ALLOW FILTERING;").one()
+        row = session.execute(title_of, (book_id,)).one()
         if row:
             top5_titles.append((row.title, count))
     print("Query3 completed: top 5 titles retrieved.")
     return top5_titles
 
+def query4_borrowers(session, fetch_size=None):
+    """
+    Yields (name, history rows) for every borrower with more than 2 transactions since 2022-01-01.
+    The borrowers are read fetch_size rows per page (the driver's default when None).
+    """
+    since = Date("2022-01-01")
+    history = prepared(session, "SELECT title, borrow_date, return_date FROM transactions_by_borrower "
+                                "WHERE borrower_id = ?;")
+    borrowers = prepared(session, "SELECT borrower_id, name FROM borrowers;").bind(())
+    if fetch_size:
+        borrowers.fetch_size = fetch_size
+    for row in session.execute(borrowers):
+        transactions = list(session.execute(history, (row.borrower_id,)))
+        if sum(1 for t in transactions if t.borrow_date >= since) > 2:
+            yield row.name, [(row.name, t.title or "Unknown", t.borrow_date, t.return_date) for t in transactions]
+
 def query4(session):
     print("Running Query4...")
-    rows = session.execute("SELECT borrower_id, borrow_date FROM transactions WHERE borrow_date >= '2022-01-01' ALLOW FILTERING;")
+    eligible_borrowers = 0
+    detailed_history = []
+    for _, rows in query4_borrowers(session):
+        eligible_borrowers += 1
+        detailed_history.extend(rows)
+    print(f"Query4 completed: found history for {eligible_borrowers} borrowers.")
+    return detailed_history
+
+# --- Async fan-out variants ---
+# Books are read once per query into a book_id -> (genre, title) map, the partition reads only fetch
+# book ids and dates, and the genre/title join happens client side.
+
+def load_books(session):
+    rows = session.execute(prepared(session, "SELECT book_id, genre, title FROM books;"))
+    return {row.book_id: (row.genre, row.title) for row in rows}
+
+def fan_out(session, statement, keys, concurrency=None):
+    """
+    Executes statement once per key with at most concurrency requests in flight.
+    Returns the result sets in key order.
+    """
+    results = execute_concurrent_with_args(session, statement, [(key,) for key in keys],
+                                           concurrency=concurrency or query_concurrency, raise_on_first_error=True)
+    return [result for _, result in results]
+
+def query2_async(session):
+    print("Running Query2 (async)...")
+    books = load_books(session)
+    borrowers = list(session.execute(prepared(session, "SELECT borrower_id, name FROM borrowers;")))
+    history = prepared(session, "SELECT book_id FROM transactions_by_borrower WHERE borrower_id = ?;")
+    results = []
+    for row, transactions in zip(borrowers, fan_out(session, history, [b.borrower_id for b in borrowers])):
+        count = sum(1 for t in transactions if books.get(t.book_id, (None, None))[0] == "Fiction")
+        results.append((row.name, count))
+    print(f"Query2 completed: processed {len(results)} borrowers.")
+    return results
+
+def query3_async(session):
+    print("Running Query3 (async)...")
+    books = load_books(session)
+    freq = book_counts(session)
+    top5 = sorted(freq.items(), key=lambda x: x[1], reverse=True)[:5]
+    top5_titles = [(books[book_id][1], count) for book_id, count in top5 if book_id in books]
+    print("Query3 completed: top 5 titles retrieved.")
+    return top5_titles
+
+def query4_async(session):
+    print("Running Query4 (async)...")
+    since = Date("2022-01-01")
+    books = load_books(session)
+    borrowers = list(session.execute(prepared(session, "SELECT borrower_id, name FROM borrowers;")))
+    history = prepared(session, "SELECT book_id, borrow_date, return_date FROM transactions_by_borrower "
+                                "WHERE borrower_id = ?;")
+    eligible_borrowers = 0
+    detailed_history = []
+    for row, transactions in zip(borrowers, fan_out(session, history, [b.borrower_id for b in borrowers])):
+        transactions = list(transactions)
+        if sum(1 for t in transactions if t.borrow_date >= since) > 2:
+            eligible_borrowers += 1
+            for t in transactions:
+                title = books.get(t.book_id, (None, "Unknown"))[1]
+                detailed_history.append((row.name, title, t.borrow_date, t.return_date))
+    print(f"Query4 completed: found history for {eligible_borrowers} borrowers.")
+    return detailed_history
+
+# --- Date-range reads over transactions_by_month ---
+
+def transactions_between(session, since, until=None):
+    """
+    Yields the transactions borrowed between since and until (inclusive; until defaults to today).
+    The range is expanded into its month buckets, which are read in parallel with at most
+    query_concurrency requests in flight, so the cost follows the window rather than the whole history.
+    """
+    until = until or datetime.date.today()
+    statement = prepared(session, "SELECT transaction_id, borrower_id, book_id, borrow_date, return_date "
+                                  "FROM transactions_by_month "
+                                  "WHERE year_month = ? AND borrow_date >= ? AND borrow_date <= ?;")
+    params = [(bucket, since, until) for bucket in cassandra_schema.month_buckets(since, until)]
+    results = execute_concurrent_with_args(session, statement, params, concurrency=query_concurrency,
+                                           raise_on_first_error=True)
+    for _, rows in results:
+        yield from rows
+
+def query4_month_borrowers(session, window=None):
+    """
+    Like query4_borrowers, but finds the eligible borrowers from the transactions_by_month buckets.
+    Their names and histories are fanned out window borrowers at a time, each window only once the
+    previous one has been consumed (all at once when window is None).
+    """
     borrower_counts = {}
-    for row in rows:
+    for row in transactions_between(session, "2022-01-01"):
         borrower_counts[row.borrower_id] = borrower_counts.get(row.borrower_id, 0) + 1
     eligible_borrowers = [bid for bid, count in borrower_counts.items() if count > 2]
+    name_of = prepared(session, "SELECT name FROM borrowers WHERE borrower_id = ?;")
+    history = prepared(session, "SELECT title, borrow_date, return_date FROM transactions_by_borrower "
+                                "WHERE borrower_id = ?;")
+    window = window or max(len(eligible_borrowers), 1)
+    for start in range(0, len(eligible_borrowers), window):
+        borrower_ids = eligible_borrowers[start:start + window]
+        names = fan_out(session, name_of, borrower_ids)
+        histories = fan_out(session, history, borrower_ids)
+        for name_rows, transactions in zip(names, histories):
+            row = name_rows.one()
+            name = row.name if row else "Unknown"
+            yield name, [(name, t.title or "Unknown", t.borrow_date, t.return_date) for t in transactions]
+
+def query4_month(session):
+    print("Running Query4 (month buckets)...")
+    eligible_borrowers = 0
     detailed_history = []
-    for borrower_id in eligible_borrowers:
-        row = session.execute(f"SELECT name FROM borrowers WHERE borrower_id = {borrower_id} ALLOW FILTERING;").one()
-        name = row.name if row else "Unknown"
-        rows2 = session.execute(f"SELECT book_id, borrow_date, return_date FROM transactions WHERE borrower_id = {borrower_id} ALLOW FILTERING;")
-        for r in rows2:
-            row3 = session.execute(f"SELECT title FROM books WHERE book_id = {r.book_id} ALLOW FILTERING;").one()
-            title = row3.title if row3 else "Unknown"
-            detailed_history.append((name, title, r.borrow_date, r.return_date))
-    print(f"Query4 completed: found history for {len(eligible_borrowers)} borrowers.")
+    for _, rows in query4_month_borrowers(session):
+        eligible_borrowers += 1
+        detailed_history.extend(rows)
+    print(f"Query4 completed: found history for {eligible_borrowers} borrowers.")
     return detailed_history
 
 # --- Queries Dictionary ---
 # For Query1, we use a lambda so that we can pass the name_pattern parameter.
-queries = {
+sync_queries = {
     "Query1": lambda session: query1(session, name_pattern),
     "Query2": query2,
     "Query3": query3,
     "Query4": query4
 }
 
+async_queries = {
+    "Query1": lambda session: query1(session, name_pattern),
+    "Query2": query2_async,
+    "Query3": query3_async,
+    "Query4": query4_async
+}
+
+queries = dict(async_queries if execution_mode == "async" else sync_queries)
+if query4_strategy == "month":
+    queries["Query4"] = query4_month
+
 def measure_cassandra_query(query_func, session):
+    """
+    Returns first, average and 95% CI times in ms, plus the number of statements prepared during
+    the cold run and during the 30 warm runs (which should reuse them and prepare nothing).
+    """
     times = []
+    prepared_before = len(_prepared)
     # Cold run
     start = time.time()
     query_func(session)
     first_time = (time.time() - start) * 1000  # ms
+    prepared_cold = len(_prepared) - prepared_before
     # 30 subsequent runs
     for i in range(30):
         start = time.time()
@@ -161,15 +308,30 @@ def measure_cassandra_query(query_func, session):
         print(f"Iteration {i+1} complete: {elapsed:.2f} ms")
     avg_time = sum(times) / len(times)
     conf_interval = 1.96 * statistics.stdev(times) / (len(times) ** 0.5)
-    return first_time, avg_time, conf_interval
+    prepared_warm = len(_prepared) - prepared_before - prepared_cold
+    return first_time, avg_time, conf_interval, (prepared_cold, prepared_warm)
+
+def query4_rows(session, mode):
+    """Query4's history rows: a list with mode "materialize", a generator with mode "stream"."""
+    if query4_strategy == "month":
+        groups = query4_month_borrowers(session, query_concurrency if mode == "stream" else None)
+    else:
+        groups = query4_borrowers(session, stream_fetch_size if mode == "stream" else None)
+    rows = (row for _, history in groups for row in history)
+    return list(rows) if mode == "materialize" else rows
 
 if __name__ == "__main__":
     # Prompt the user for a borrower name pattern for Query1 (e.g., "J" or "Joshua")
     name_pattern = input("Enter the borrower name pattern (e.g., 'J' for names starting with J): ")
     
-    cluster = Cluster(['127.0.0.1'])
-    session = cluster.connect('library')
+    # Long-lived session (see connections.py); opening it is reported apart from query times
+    session = connections.cassandra_session()
+    connections.handshake_report()
+    # Create the keyspace, source tables and query tables if they do not exist yet
+    cassandra_schema.create_schema(session)
     print(f"Dataset Size: {dataset_size}")
+    print(f"Execution mode: {execution_mode}" + (f" (concurrency {query_concurrency})" if execution_mode == "async" else ""))
+    print(f"Query3 strategy: {query3_strategy}, Query4 strategy: {query4_strategy}")
     
     # Load data from CSV subset into Cassandra.
     load_data_from_csv(dataset_size, session)
@@ -177,11 +339,12 @@ if __name__ == "__main__":
     # Measure performance for each query.
     for query_name, func in queries.items():
         print(f"\nMeasuring {query_name}...")
-        first_time, avg_time, conf_interval = measure_cassandra_query(func, session)
+        first_time, avg_time, conf_interval, (prepared_cold, prepared_warm) = measure_cassandra_query(func, session)
         print(f"{query_name} Performance:")
         print(f"  First Execution Time: {first_time:.2f} ms")
         print(f"  Average Execution Time: {avg_time:.2f} ms")
         print(f"  95% Confidence Interval: ±{conf_interval:.2f} ms")
+        print(f"  Statements prepared: {prepared_cold} in the cold run, {prepared_warm} in the warm runs")
         
         # For Query1, print the sorted list of matching borrower names.
         if query_name == "Query1":
@@ -189,5 +352,10 @@ if __name__ == "__main__":
             print(f"Borrowers whose names start with '{name_pattern}':")
             for name in results:
                 print(name)
-    session.shutdown()
-    cluster.shutdown()
+
+    # Materialized vs streamed consumption of Query4's result
+    print()
+    for mode in consumption_modes:
+        stats = consumption.measure_consumption(lambda: consumption.consume(lambda: query4_rows(session, mode)))
+        consumption.print_consumption("Query4", mode, stats)
+    connections.close_all()
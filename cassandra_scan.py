@@ -0,0 +1,126 @@
+import threading
+from collections import Counter
+
+# Murmur3Partitioner token bounds.
+MIN_TOKEN = -2 ** 63
+MAX_TOKEN = 2 ** 63 - 1
+
+# Token ranges the ring is split into; more ranges than nodes keeps every coordinator busy.
+SPLITS = 32
+
+# Ranges scanned at the same time.
+CONCURRENCY = 8
+
+# Rows per page fetched from each range.
+FETCH_SIZE = 5000
+
+# Seconds a whole scan may take before parallel_scan gives up.
+TIMEOUT = 600
+
+
+def token_ranges(splits=SPLITS):
+    """Splits the whole ring into splits contiguous (start, end] token ranges."""
+    step = (MAX_TOKEN - MIN_TOKEN) // splits
+    bounds = [MIN_TOKEN + i * step for i in range(splits)] + [MAX_TOKEN]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def range_query(table, partition_key, columns):
+    """CQL reading columns from the rows whose partition token lies in (?, ?]."""
+    return (f"SELECT {', '.join(columns)} FROM {table} "
+            f"WHERE token({partition_key}) > ? AND token({partition_key}) <= ?")
+
+
+def parallel_scan(session, statement, ranges, consume, concurrency=CONCURRENCY, fetch_size=FETCH_SIZE,
+                  timeout=TIMEOUT):
+    """
+    Runs the prepared range statement for every (start, end) range, keeping at most concurrency
+    ranges in flight, and pages through each with fetch_size rows per page. consume(i, rows) is
+    called once per page of range i, from the driver's event loop; pages of one range arrive in
+    order and never concurrently, so per-range state needs no locking. Raises TimeoutError if the
+    scan has not finished after timeout seconds.
+    """
+    ranges = list(ranges)
+    if not ranges:
+        return
+    lock = threading.Lock()
+    finished = threading.Event()
+    state = {"next": 0, "running": 0, "error": None}
+
+    # The lock only guards the counters: the driver may run a callback right away on the thread that
+    # adds it (when the page is already there), so requests are never sent while holding it.
+    def reserve():
+        """Index of the next range to start (counted as running), or None when there is none."""
+        with lock:
+            if state["error"] is None and state["next"] < len(ranges):
+                i = state["next"]
+                state["next"] += 1
+                state["running"] += 1
+                return i
+            if state["running"] == 0:
+                finished.set()
+            return None
+
+    def start_next():
+        i = reserve()
+        if i is None:
+            return
+        try:
+            bound = statement.bind(ranges[i])
+            bound.fetch_size = fetch_size
+            future = session.execute_async(bound)
+        except Exception as exc:
+            range_done(exc)
+            return
+        future.add_callbacks(on_page, on_error, callback_args=(future, i))
+
+    def range_done(error=None):
+        with lock:
+            state["running"] -= 1
+            if error is not None and state["error"] is None:
+                state["error"] = error
+        start_next()
+
+    def on_page(rows, future, i):
+        try:
+            consume(i, rows)
+        except Exception as exc:
+            range_done(exc)
+            return
+        if future.has_more_pages:
+            future.start_fetching_next_page()
+        else:
+            range_done()
+
+    def on_error(exc):
+        range_done(exc)
+
+    for _ in range(min(concurrency, len(ranges))):
+        start_next()
+    if not finished.wait(timeout):
+        with lock:
+            # Stops the ranges still running from starting new ones
+            state["error"] = state["error"] or TimeoutError(f"Token-range scan not finished after {timeout} s")
+        raise TimeoutError(f"Token-range scan not finished after {timeout} s "
+                           f"({state['next']} of {len(ranges)} ranges started, {state['running']} running)")
+    if state["error"] is not None:
+        raise state["error"]
+
+
+def count_by(session, statement, column, splits=SPLITS, concurrency=CONCURRENCY, fetch_size=FETCH_SIZE):
+    """
+    Counts rows per value of column over the whole table with a parallel token-range scan.
+    statement is a prepared range_query(...) that selects column. Each range counts into its own
+    Counter and the partial counts are merged at the end.
+    """
+    ranges = token_ranges(splits)
+    partials = [Counter() for _ in ranges]
+
+    def consume(i, rows):
+        partials[i].update(getattr(row, column) for row in rows)
+
+    parallel_scan(session, statement, ranges, consume, concurrency, fetch_size)
+    total = Counter()
+    for partial in partials:
+        total.update(partial)
+    return total
@@ -0,0 +1,137 @@
+import datetime
+
+from cassandra.cluster import Cluster
+
+KEYSPACE = "library"
+REPLICATION = "{'class': 'SimpleStrategy', 'replication_factor': 1}"
+
+# Leading characters of the lowercased name used as the borrowers_by_name_prefix partition key.
+PREFIX_LENGTH = 1
+
+# Source tables, loaded straight from the CSV files.
+BASE_TABLES = {
+    "books": """
+        CREATE TABLE IF NOT EXISTS books (
+            book_id int PRIMARY KEY,
+            title text,
+            author text,
+            year int,
+            genre text
+        )""",
+    "borrowers": """
+        CREATE TABLE IF NOT EXISTS borrowers (
+            borrower_id int PRIMARY KEY,
+            name text,
+            email text
+        )""",
+    "transactions": """
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id int PRIMARY KEY,
+            book_id int,
+            borrower_id int,
+            borrow_date date,
+            return_date date
+        )""",
+}
+
+# Query tables, one per access pattern, populated by cassandra_loader from the same CSV files:
+#   transactions_by_borrower  - a borrower's whole history in one partition, with the book's genre
+#                               and title copied in, so Query2/Query4 need no per-transaction lookups
+#   borrowers_by_name_prefix  - borrowers grouped by the first PREFIX_LENGTH letters of their
+#                               lowercased name and sorted by it, so Query1 is a clustering range read
+#   transactions_by_month     - transactions bucketed by borrow month ('YYYY-MM') and sorted by date,
+#                               so a date range reads only the months it covers (see month_buckets)
+QUERY_TABLES = {
+    "transactions_by_borrower": """
+        CREATE TABLE IF NOT EXISTS transactions_by_borrower (
+            borrower_id int,
+            borrow_date date,
+            transaction_id int,
+            book_id int,
+            genre text,
+            title text,
+            return_date date,
+            PRIMARY KEY ((borrower_id), borrow_date, transaction_id)
+        )""",
+    "borrowers_by_name_prefix": """
+        CREATE TABLE IF NOT EXISTS borrowers_by_name_prefix (
+            prefix text,
+            name_lower text,
+            borrower_id int,
+            name text,
+            PRIMARY KEY ((prefix), name_lower, borrower_id)
+        )""",
+    "transactions_by_month": """
+        CREATE TABLE IF NOT EXISTS transactions_by_month (
+            year_month text,
+            borrow_date date,
+            transaction_id int,
+            borrower_id int,
+            book_id int,
+            return_date date,
+            PRIMARY KEY ((year_month), borrow_date, transaction_id)
+        )""",
+}
+
+# Counter tables (counters cannot share a table with regular columns), kept up to date by cassandra_loader:
+#   book_borrow_counts - number of transactions per book, so Query3 reads one row per book
+COUNTER_TABLES = {
+    "book_borrow_counts": """
+        CREATE TABLE IF NOT EXISTS book_borrow_counts (
+            book_id int PRIMARY KEY,
+            borrow_count counter
+        )""",
+}
+
+
+def name_prefix(name):
+    """Partition key of a borrower name in borrowers_by_name_prefix."""
+    return name.lower()[:PREFIX_LENGTH]
+
+
+def prefix_range(pattern):
+    """
+    Lowercased [lower, upper) bounds on name_lower for names starting with pattern.
+    upper is None when pattern is empty (no bound).
+    """
+    lower = pattern.lower()
+    if not lower:
+        return lower, None
+    return lower, lower[:-1] + chr(ord(lower[-1]) + 1)
+
+
+def _as_date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def year_month(value):
+    """transactions_by_month partition key ('YYYY-MM') of a date or ISO date string."""
+    return value[:7] if isinstance(value, str) else value.strftime("%Y-%m")
+
+
+def month_buckets(start, end):
+    """Every transactions_by_month partition key from start's month to end's month, inclusive."""
+    start, end = _as_date(start), _as_date(end)
+    year, month = start.year, start.month
+    buckets = []
+    while (year, month) <= (end.year, end.month):
+        buckets.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return buckets
+
+
+def create_schema(session, keyspace=KEYSPACE, query_tables=True):
+    """Creates the keyspace and tables if missing and switches the session to the keyspace."""
+    session.execute(f"CREATE KEYSPACE IF NOT EXISTS {keyspace} WITH replication = {REPLICATION}")
+    session.set_keyspace(keyspace)
+    tables = dict(BASE_TABLES, **(dict(QUERY_TABLES, **COUNTER_TABLES) if query_tables else {}))
+    for ddl in tables.values():
+        session.execute(ddl)
+    print(f"Schema ready in keyspace {keyspace}: {', '.join(tables)}")
+
+
+if __name__ == "__main__":
+    cluster = Cluster(['127.0.0.1'])
+    session = cluster.connect()
+    create_schema(session)
+    cluster.shutdown()
@@ -0,0 +1,248 @@
+import csv
+import os
+import json
+
+import numpy as np
+
+# Typed columnar layout used next to the CSV fixtures:
+#   <stem>.cols/schema.json     row count and column types
+#   <stem>.cols/<col>.bin       int32 values (dates as days since 1970-01-01) or UTF-8 string bytes
+#   <stem>.cols/<col>.off       int64 string offsets (rows + 1), only for "str" columns
+# Everything is little-endian and memory-mapped on read, so loading costs one sequential read.
+TABLE_SCHEMAS = {
+    "books": [("book_id", "int32"), ("title", "str"), ("author", "str"), ("year", "int32"), ("genre", "str")],
+    "borrowers": [("borrower_id", "int32"), ("name", "str"), ("email", "str")],
+    "transactions": [("transaction_id", "int32"), ("book_id", "int32"), ("borrower_id", "int32"),
+                     ("borrow_date", "date"), ("return_date", "date")],
+}
+
+BATCH_SIZE = 50_000
+
+
+def table_of(stem):
+    """'books_25' or 'books_25.csv' -> 'books'."""
+    return os.path.basename(stem).split(".")[0].split("_")[0]
+
+
+def columnar_path(stem):
+    return stem[:-4] + ".cols" if stem.endswith(".csv") else stem + ".cols"
+
+
+def dates_to_days(values):
+    return np.asarray(values, dtype="datetime64[D]").astype(np.int32)
+
+
+def days_to_dates(days):
+    return np.asarray(days, dtype=np.int32).astype("datetime64[D]").astype(str)
+
+
+class ColumnarWriter:
+    """
+    Appends batches of rows to a columnar table. Use as a context manager; the schema
+    (with the final row count) is written on close, and only when no exception is in flight,
+    so a failed write leaves no table that looks complete.
+    """
+
+    def __init__(self, stem, table=None):
+        self.path = columnar_path(stem)
+        self.schema = TABLE_SCHEMAS[table or table_of(stem)]
+        self.rows = 0
+        os.makedirs(self.path, exist_ok=True)
+        # The column files are rewritten from scratch, so an older schema.json no longer describes them
+        schema_file = os.path.join(self.path, "schema.json")
+        if os.path.exists(schema_file):
+            os.remove(schema_file)
+        self._files = {}
+        self._offsets = {}
+        for name, kind in self.schema:
+            self._files[name] = open(os.path.join(self.path, f"{name}.bin"), "wb")
+            if kind == "str":
+                self._files[name + ".off"] = open(os.path.join(self.path, f"{name}.off"), "wb")
+                self._offsets[name] = 0
+                self._files[name + ".off"].write(np.zeros(1, dtype="<i8").tobytes())
+
+    def write_columns(self, columns):
+        """columns maps each column name to a sequence; int/date columns may already be int32 day arrays."""
+        n = None
+        for name, kind in self.schema:
+            values = columns[name]
+            if kind == "str":
+                encoded = [v.encode("utf-8") for v in values]
+                lengths = np.fromiter((len(b) for b in encoded), dtype="<i8", count=len(encoded))
+                self._files[name].write(b"".join(encoded))
+                offsets = self._offsets[name] + np.cumsum(lengths)
+                self._files[name + ".off"].write(offsets.astype("<i8").tobytes())
+                if len(offsets):
+                    self._offsets[name] = int(offsets[-1])
+                n = len(encoded)
+            else:
+                arr = np.asarray(values)
+                if kind == "date" and arr.dtype.kind in "UOSM":
+                    arr = dates_to_days(arr)
+                arr = arr.astype("<i4")
+                self._files[name].write(arr.tobytes())
+                n = len(arr)
+        self.rows += n or 0
+
+    def write_rows(self, rows):
+        """Appends rows given as CSV field lists in schema order."""
+        if rows:
+            self.write_columns({name: list(col) for (name, _), col in zip(self.schema, zip(*rows))})
+
+    def _close_files(self):
+        for f in self._files.values():
+            f.close()
+
+    def close(self):
+        self._close_files()
+        with open(os.path.join(self.path, "schema.json"), "w") as f:
+            json.dump({"rows": self.rows, "columns": [[name, kind] for name, kind in self.schema]}, f)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_files()
+
+
+class ColumnarTable:
+    """Memory-mapped, read-only view of a columnar table."""
+
+    def __init__(self, stem):
+        self.path = columnar_path(stem)
+        with open(os.path.join(self.path, "schema.json")) as f:
+            meta = json.load(f)
+        self.rows = meta["rows"]
+        self.schema = [tuple(c) for c in meta["columns"]]
+        self._columns = {}
+        for name, kind in self.schema:
+            data = self._map(f"{name}.bin", "<i4" if kind != "str" else np.uint8)
+            if kind == "str":
+                self._columns[name] = (self._map(f"{name}.off", "<i8"), data)
+            else:
+                self._columns[name] = data
+
+    def _map(self, filename, dtype):
+        path = os.path.join(self.path, filename)
+        if os.path.getsize(path) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def column(self, name, start=0, stop=None):
+        """Returns a column slice: int32 arrays for int/date columns, a list of str for strings."""
+        stop = self.rows if stop is None else min(stop, self.rows)
+        kind = dict(self.schema)[name]
+        if kind == "str":
+            offsets, data = self._columns[name]
+            offs = offsets[start:stop + 1]
+            raw = data[offs[0]:offs[-1]].tobytes() if stop > start else b""
+            base = int(offs[0]) if stop > start else 0
+            bounds = (offs - base).tolist()
+            return [raw[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(stop - start)]
+        return np.asarray(self._columns[name][start:stop])
+
+    def batches(self, batch_size=BATCH_SIZE):
+        """Yields dicts of column name -> typed column slice, batch_size rows at a time."""
+        for start in range(0, self.rows, batch_size):
+            yield {name: self.column(name, start, start + batch_size) for name, _ in self.schema}
+
+
+def exists(stem):
+    """
+    True when stem has a complete columnar copy that is not older than the CSV next to it, so a
+    CSV regenerated or edited without its copy is read from the CSV instead of the stale copy.
+    """
+    schema_file = os.path.join(columnar_path(stem), "schema.json")
+    if not os.path.exists(schema_file):
+        return False
+    csv_file = stem if stem.endswith(".csv") else stem + ".csv"
+    return not os.path.exists(csv_file) or os.path.getmtime(schema_file) >= os.path.getmtime(csv_file)
+
+
+def batch_rows(batch, schema, dates="str"):
+    """
+    Turns a column batch into a list of row tuples of plain Python values in schema order.
+    Dates become ISO strings (dates="str"), datetime.date objects (dates="date") or day numbers (dates="days").
+    """
+    columns = []
+    for name, kind in schema:
+        col = batch[name]
+        if kind == "int32":
+            col = col.tolist()
+        elif kind == "date":
+            if dates == "str":
+                col = days_to_dates(col).tolist()
+            elif dates == "date":
+                col = col.astype("datetime64[D]").tolist()
+            else:
+                col = col.tolist()
+        columns.append(col)
+    return list(zip(*columns))
+
+
+def batch_dicts(batch, schema, dates="str"):
+    """Like batch_rows, but returns one {column: value} dict per row (documents / query parameters)."""
+    names = [name for name, _ in schema]
+    return [dict(zip(names, row)) for row in batch_rows(batch, schema, dates)]
+
+
+def _csv_batches(csv_file, table, batch_size):
+    schema = TABLE_SCHEMAS[table]
+    converters = [int if kind == "int32" else None for _, kind in schema]
+    with open(csv_file, "r", newline="") as f:
+        reader = csv.reader(f)
+        next(reader)  # Skip header
+        while True:
+            rows = [row for _, row in zip(range(batch_size), reader)]
+            if not rows:
+                break
+            batch = {}
+            for (name, kind), conv, col in zip(schema, converters, zip(*rows)):
+                if kind == "date":
+                    batch[name] = dates_to_days(col)
+                elif conv is not None:
+                    batch[name] = np.fromiter(map(conv, col), dtype=np.int32, count=len(col))
+                else:
+                    batch[name] = list(col)
+            yield batch
+
+
+def load_batches(stem, batch_size=BATCH_SIZE, table=None):
+    """
+    Shared reader for the loaders: yields typed column batches for books_<suffix>, borrowers_<suffix>
+    or transactions_<suffix>. Uses the memory-mapped columnar copy when present and falls back to
+    parsing the CSV otherwise, so callers see the same batch shape either way.
+    """
+    if exists(stem):
+        yield from ColumnarTable(stem).batches(batch_size)
+    else:
+        csv_file = stem if stem.endswith(".csv") else stem + ".csv"
+        yield from _csv_batches(csv_file, table or table_of(stem), batch_size)
+
+
+def load_rows(stem, batch_size=BATCH_SIZE, table=None, dates="str"):
+    """Like load_batches, but yields lists of row tuples with Python values."""
+    schema = ColumnarTable(stem).schema if exists(stem) else TABLE_SCHEMAS[table or table_of(stem)]
+    for batch in load_batches(stem, batch_size, table):
+        yield batch_rows(batch, schema, dates)
+
+
+def convert_csv(stem):
+    """Writes the columnar copy of an existing CSV file."""
+    table = table_of(stem)
+    csv_file = stem if stem.endswith(".csv") else stem + ".csv"
+    with ColumnarWriter(stem, table) as writer:
+        for batch in _csv_batches(csv_file, table, BATCH_SIZE):
+            writer.write_columns(batch)
+    print(f"Wrote {columnar_path(stem)} with {writer.rows} records.")
+
+
+if __name__ == "__main__":
+    # Convert the existing CSV fixtures in the current directory.
+    for table in TABLE_SCHEMAS:
+        for suffix in ["", "_25", "_50", "_75", "_100"]:
+            if os.path.exists(f"{table}{suffix}.csv"):
+                convert_csv(f"{table}{suffix}")
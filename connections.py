@@ -0,0 +1,160 @@
+import time
+from contextlib import contextmanager
+
+# Shared, long-lived connections for the benchmark scripts. Every client is created once per process
+# (on first use) and reused, so queries are timed without connect/auth round trips. The time spent
+# opening connections is recorded separately (see handshake_report).
+# The drivers are imported inside the factories, so a script only needs the driver it actually uses.
+
+# Connections kept per client (MySQL pool size, Mongo/Redis/Neo4j max pool size).
+POOL_SIZE = 5
+
+# Open (and authenticate) the pooled connections up front instead of on first use.
+PREWARM = True
+
+MYSQL_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 3307,
+    "user": "user",
+    "password": "userpassword",
+    "database": "library",
+    # Needed by mysql_loader's "infile" mode; the server must also have local_infile=ON (see docker-compose.yml).
+    "allow_local_infile": True,
+}
+MONGO_URI = "mongodb://localhost:27017/"
+CASSANDRA_HOSTS = ["127.0.0.1"]
+REDIS_CONFIG = {"host": "localhost", "port": 6379, "db": 0}
+NEO4J_URI = "bolt://localhost:7687"
+NEO4J_AUTH = ("neo4j", "password")
+
+_clients = {}
+_handshakes = {}
+
+
+def _record(label, seconds, connections=1):
+    total, count = _handshakes.get(label, (0.0, 0))
+    _handshakes[label] = (total + seconds, count + connections)
+
+
+def handshake_report():
+    """Prints and returns {label: (total ms, connections)} for every connection set up so far."""
+    report = {label: (total * 1000, count) for label, (total, count) in _handshakes.items()}
+    for label, (total_ms, count) in report.items():
+        print(f"Connection setup ({label}): {count} connection(s) in {total_ms:.2f} ms "
+              f"({total_ms / max(count, 1):.2f} ms each)")
+    return report
+
+
+# --- MySQL ---
+
+def mysql_pool(pool_size=POOL_SIZE):
+    """
+    A MySQLConnectionPool of pool_size connections (at most 32). The connector opens all of them when
+    the pool is created, so the MySQL pool is always pre-warmed.
+    """
+    if "mysql" not in _clients:
+        from mysql.connector.pooling import MySQLConnectionPool
+        start = time.perf_counter()
+        _clients["mysql"] = MySQLConnectionPool(pool_name="library", pool_size=pool_size, **MYSQL_CONFIG)
+        _record("mysql", time.perf_counter() - start, pool_size)
+    return _clients["mysql"]
+
+
+@contextmanager
+def mysql_connection():
+    """Borrows a connection from the pool and returns it (closing it only hands it back)."""
+    start = time.perf_counter()
+    conn = mysql_pool().get_connection()
+    _record("mysql checkout", time.perf_counter() - start)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+# --- MongoDB ---
+
+def mongo_client(pool_size=POOL_SIZE, prewarm=PREWARM):
+    if "mongo" not in _clients:
+        from pymongo import MongoClient
+        start = time.perf_counter()
+        client = MongoClient(MONGO_URI, maxPoolSize=pool_size, minPoolSize=pool_size if prewarm else 0)
+        if prewarm:
+            # Forces server selection and one authenticated connection; minPoolSize fills the rest.
+            client.admin.command("ping")
+        _record("mongo", time.perf_counter() - start)
+        _clients["mongo"] = client
+    return _clients["mongo"]
+
+
+# --- Cassandra ---
+
+def cassandra_session(keyspace=None):
+    """
+    One Cluster/Session per process. With protocol v3+ the driver multiplexes requests over one
+    connection per host, so there is no pool size to set; connecting always opens it.
+    """
+    if "cassandra" not in _clients:
+        from cassandra.cluster import Cluster
+        start = time.perf_counter()
+        cluster = Cluster(CASSANDRA_HOSTS)
+        session = cluster.connect(keyspace)
+        _record("cassandra", time.perf_counter() - start)
+        _clients["cassandra"] = (cluster, session)
+    return _clients["cassandra"][1]
+
+
+# --- Redis ---
+
+def _redis_pooled_client(label, pool_size, prewarm, **options):
+    import redis
+    pool = redis.ConnectionPool(max_connections=pool_size, **REDIS_CONFIG, **options)
+    client = redis.Redis(connection_pool=pool)
+    if prewarm:
+        start = time.perf_counter()
+        # get_connection() connects each new connection before handing it out. redis-py before 5.3
+        # requires a command name (later versions ignore it), so one is passed for either.
+        connections = [pool.get_connection("PING") for _ in range(pool_size)]
+        for connection in connections:
+            pool.release(connection)
+        _record(label, time.perf_counter() - start, pool_size)
+    return client
+
+
+def redis_client(pool_size=POOL_SIZE, prewarm=PREWARM):
+    """
+    The shared bytes-mode client. Its decode_responses twin, which redis_scan uses for the query
+    reads (redis_scan.decoding_client), gets its own pool of the same size, pre-warmed with it.
+    """
+    if "redis" not in _clients:
+        import redis_scan
+        client = _redis_pooled_client("redis", pool_size, prewarm)
+        decoded = _redis_pooled_client("redis (decoded)", pool_size, prewarm, decode_responses=True)
+        redis_scan.register_decoding_client(client, decoded)
+        _clients["redis"] = client
+        _clients["redis decoded"] = decoded
+    return _clients["redis"]
+
+
+# --- Neo4j ---
+
+def neo4j_driver(pool_size=POOL_SIZE, prewarm=PREWARM):
+    if "neo4j" not in _clients:
+        from neo4j import GraphDatabase
+        driver = GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH, max_connection_pool_size=pool_size)
+        if prewarm:
+            start = time.perf_counter()
+            driver.verify_connectivity()
+            _record("neo4j", time.perf_counter() - start)
+        _clients["neo4j"] = driver
+    return _clients["neo4j"]
+
+
+def close_all():
+    """Closes every client created so far (MySQL pooled connections close with the process)."""
+    for name, client in list(_clients.items()):
+        if name == "cassandra":
+            client[0].shutdown()
+        elif name in ("mongo", "redis", "redis decoded", "neo4j"):
+            client.close()
+        del _clients[name]
@@ -0,0 +1,72 @@
+import time
+import tracemalloc
+
+# How the benchmark harnesses consume a query result:
+#   "materialize" - collect the whole result first (fetchall / list(...)), as the timed runs do
+#   "stream"      - walk the rows as the driver pages them in, keeping none of them
+CONSUMPTION_MODES = ("materialize", "stream")
+
+
+def consume(execute):
+    """
+    Calls execute() and iterates the rows it returns without keeping them. Returns (rows, ms to the
+    first row, ms in total), both counted from the call. A materialized result (a list) only hands
+    out its first row once everything is fetched; a streamed one as soon as the first page arrives.
+    """
+    start = time.perf_counter()
+    first_row = None
+    rows = 0
+    for _ in execute():
+        if first_row is None:
+            first_row = time.perf_counter()
+        rows += 1
+    end = time.perf_counter()
+    return rows, ((first_row or end) - start) * 1000, (end - start) * 1000
+
+
+def traced_peak_mb(run):
+    """
+    Peak memory in MB that run() allocates above what is allocated when it starts, measured with
+    tracemalloc. Counts allocations made through Python's allocators, which includes the rows and
+    the driver objects built for them, but not buffers a C library allocates on its own.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return (peak - baseline) / (1024 * 1024)
+
+
+def measure_consumption(run, runs=30):
+    """
+    Calls run() (which returns a consume(...) tuple) once cold and runs times warm, then once more
+    under tracemalloc, untimed since tracing slows it down. Returns a dict with the row count, the
+    cold total, the warm averages of time-to-first-row and total time, and the peak memory the
+    traced run allocated, so the two modes are compared per run whatever ran before them.
+    """
+    rows, _, cold_ms = run()
+    first_row, total = [], []
+    for _ in range(runs):
+        _, first_ms, total_ms = run()
+        first_row.append(first_ms)
+        total.append(total_ms)
+    return {
+        "rows": rows,
+        "cold_ms": cold_ms,
+        "first_row_ms": sum(first_row) / len(first_row),
+        "total_ms": sum(total) / len(total),
+        "peak_memory_mb": traced_peak_mb(run),
+    }
+
+
+def print_consumption(label, mode, stats):
+    print(f"{label} ({mode}): {stats['rows']} rows, first row after {stats['first_row_ms']:.2f} ms, "
+          f"all rows after {stats['total_ms']:.2f} ms (cold {stats['cold_ms']:.2f} ms), "
+          f"peak client memory {stats['peak_memory_mb']:.2f} MB")
@@ -1,9 +1,9 @@
-import pandas as pd
+import csv
+from contextlib import ExitStack
 
-# List of CSV files to create subsets from
-files = ["books.csv", "borrowers.csv", "transactions.csv"]
+from columnar import ColumnarWriter, BATCH_SIZE
 
-# Define the percentages for subsets
+# Define the percentages for subsets (ascending, so a row's level is the first fraction it falls under)
 fractions = {
     "25": 0.25,
     "50": 0.50,
@@ -11,10 +11,86 @@ fractions = {
     "100": 1.0
 }
 
-for file in files:
-    df = pd.read_csv(file)
-    for label, frac in fractions.items():
-        subset = df.sample(frac=frac, random_state=42) if frac < 1.0 else df
-        out_file = file.replace(".csv", f"_{label}.csv")
-        subset.to_csv(out_file, index=False)
-        print(f"Created {out_file} with {len(subset)} records.")
+# Salt mixed into the key hash; each table gets its own so book 7 and borrower 7 are sampled independently.
+seed = 42
+table_salts = {"books": 1, "borrowers": 2}
+
+_MASK64 = (1 << 64) - 1
+
+
+def key_fraction(key, salt):
+    """
+    Maps a primary key to a stable pseudo-random number in [0, 1) using splitmix64.
+    A row belongs to every subset whose fraction is greater than this value, which makes
+    the subsets nested (25% ⊂ 50% ⊂ 75% ⊂ 100%) without keeping any state.
+    """
+    z = (int(key) + (seed << 32) + salt * 0x9E3779B97F4A7C15) & _MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK64
+    z ^= z >> 31
+    return (z >> 11) / float(1 << 53)
+
+
+def key_level(key, salt):
+    """Returns the index of the smallest fraction that contains the key."""
+    u = key_fraction(key, salt)
+    for level, frac in enumerate(fractions.values()):
+        if u < frac:
+            return level
+    return len(fractions) - 1
+
+
+def split_file(file, level_of_row, columnar=False):
+    """
+    Reads file once and writes every subset file in the same pass.
+    level_of_row(row) returns the first fraction index the row belongs to.
+    With columnar=True each subset is also written as a typed columnar table (see columnar.py).
+    """
+    labels = list(fractions)
+    counts = dict.fromkeys(labels, 0)
+    with ExitStack() as stack:
+        f = stack.enter_context(open(file, "r", newline=""))
+        reader = csv.reader(f)
+        header = next(reader)
+        out_files = [file.replace(".csv", f"_{label}.csv") for label in labels]
+        # Entered before the CSV files so they close last: schema.json must not be older than its
+        # CSV (see columnar.exists)
+        col_writers = [stack.enter_context(ColumnarWriter(out_file)) for out_file in out_files] if columnar else []
+        writers = []
+        for out_file in out_files:
+            out = stack.enter_context(open(out_file, "w", newline=""))
+            writer = csv.writer(out, lineterminator="\n")
+            writer.writerow(header)
+            writers.append(writer)
+        pending = [[] for _ in labels]
+        for row in reader:
+            for level in range(level_of_row(row), len(labels)):
+                writers[level].writerow(row)
+                counts[labels[level]] += 1
+                if columnar:
+                    pending[level].append(row)
+                    if len(pending[level]) >= BATCH_SIZE:
+                        col_writers[level].write_rows(pending[level])
+                        pending[level] = []
+        for col_writer, rows in zip(col_writers, pending):
+            col_writer.write_rows(rows)
+    for label in labels:
+        print(f"Created {file.replace('.csv', f'_{label}.csv')} with {counts[label]} records.")
+
+
+def create_subsets(books_file="books.csv", borrowers_file="borrowers.csv", transactions_file="transactions.csv",
+                   columnar=False):
+    split_file(books_file, lambda row: key_level(row[0], table_salts["books"]), columnar)
+    split_file(borrowers_file, lambda row: key_level(row[0], table_salts["borrowers"]), columnar)
+    # A transaction is kept only where both its book and its borrower survive. The foreign keys are
+    # re-hashed instead of looked up, so memory stays bounded; with independent keys the transaction
+    # subsets therefore hold roughly fraction² of the rows.
+    split_file(transactions_file, lambda row: max(key_level(row[1], table_salts["books"]),
+                                                  key_level(row[2], table_salts["borrowers"])),
+               columnar)
+
+
+if __name__ == "__main__":
+    # Set columnar = True to also write the memory-mappable <name>_<suffix>.cols copies.
+    columnar = True
+    create_subsets(columnar=columnar)
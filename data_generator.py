@@ -1,57 +1,204 @@
 import csv
+import io
+import os
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from functools import lru_cache
+
+import numpy as np
 from faker import Faker
-import random
-
-fake = Faker()
-
-def generate_books(n, filename):
-    with open(filename, 'w', newline='') as csvfile:
-        fieldnames = ['book_id', 'title', 'author', 'year', 'genre']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for i in range(n):
-            writer.writerow({
-                'book_id': i + 1,
-                'title': fake.sentence(nb_words=4),
-                'author': fake.name(),
-                'year': random.randint(1900, 2023),
-                'genre': random.choice(['Fiction', 'Non-Fiction', 'Science', 'History', 'Biography'])
-            })
-
-def generate_borrowers(n, filename):
-    emails = set()
-    with open(filename, 'w', newline='') as csvfile:
-        fieldnames = ['borrower_id', 'name', 'email']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for i in range(n):
-            name = fake.name()
-            email = fake.email()
-            #Ensure email uniqueness
-            while email in emails:
-               email = fake.email()
-            emails.add(email)
-            writer.writerow({
-                'borrower_id': i + 1,
-                'name': name,
-                'email': email
-            })
-
-def generate_transactions(n, filename, num_books, num_borrowers):
-    with open(filename, 'w', newline='') as csvfile:
-        fieldnames = ['transaction_id', 'book_id', 'borrower_id', 'borrow_date', 'return_date']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        for i in range(n):
-            borrow_date = fake.date_between(start_date="-2y", end_date="today")
-            return_date = fake.date_between(start_date=borrow_date, end_date="today")
-            writer.writerow({
-                'transaction_id': i + 1,
-                'book_id': random.randint(1, num_books),
-                'borrower_id': random.randint(1, num_borrowers),
-                'borrow_date': borrow_date,
-                'return_date': return_date
-            })
+
+from columnar import ColumnarWriter, TABLE_SCHEMAS
+
+GENRES = ['Fiction', 'Non-Fiction', 'Science', 'History', 'Biography']
+
+# Rows per shard. Each shard is generated from its own seed, so the output only
+# depends on (seed, chunk_size) and never on how many workers are used.
+CHUNK_SIZE = 100_000
+
+# Number of distinct names/titles pre-sampled from Faker and then drawn from with NumPy.
+POOL_SIZE = 50_000
+
+# Table codes mixed into the shard seeds so every table draws an independent stream.
+BOOKS, BORROWERS, TRANSACTIONS = 0, 1, 2
+
+# Email tags are a keyed Feistel permutation of borrower_id over 32 bits, written as
+# fixed-width base36. Distinct ids always give distinct tags, so no uniqueness set is needed.
+EMAIL_TAG_ROUNDS = 4
+EMAIL_TAG_WIDTH = 7  # 36**7 > 2**32
+_BASE36 = np.frombuffer(b'0123456789abcdefghijklmnopqrstuvwxyz', dtype=np.uint8)
+
+# Pools used by the shard functions; set in each worker by _init_worker.
+_pools = None
+
+
+@lru_cache(maxsize=None)
+def build_pools(seed, pool_size=POOL_SIZE):
+    """
+    Pre-samples names, titles and email addresses with a seeded Faker instance.
+    Shards draw from these pools by index instead of calling Faker per row.
+    """
+    fake = Faker()
+    fake.seed_instance(seed)
+    names = np.array([fake.name() for _ in range(pool_size)], dtype=object)
+    titles = np.array([fake.sentence(nb_words=4) for _ in range(pool_size)], dtype=object)
+    emails = np.array([fake.email() for _ in range(pool_size)], dtype=object)
+    return {'names': names, 'titles': titles, 'emails': emails}
+
+
+def _init_worker(pools):
+    global _pools
+    _pools = pools
+
+
+def _shard_rng(seed, table, start):
+    return np.random.default_rng([seed, table, start])
+
+
+def permute_ids(ids, seed, rounds=EMAIL_TAG_ROUNDS):
+    """
+    Maps ids in [0, 2**32) to distinct values in [0, 2**32) with a balanced Feistel network.
+    The mapping is a bijection for any key, so it can be applied shard by shard.
+    """
+    keys = np.random.SeedSequence([seed, BORROWERS]).generate_state(rounds).astype(np.uint64)
+    x = np.asarray(ids, dtype=np.uint64)
+    left, right = x >> np.uint64(16), x & np.uint64(0xFFFF)
+    for k in keys:
+        f = ((right * np.uint64(0x9E3779B1) + k) ^ (right >> np.uint64(7))) & np.uint64(0xFFFF)
+        left, right = right, left ^ f
+    return (left << np.uint64(16)) | right
+
+
+def email_tags(ids, seed):
+    """Returns the fixed-width base36 tag for each id (constant time and memory per row)."""
+    values = permute_ids(ids, seed)
+    digits = np.empty((len(values), EMAIL_TAG_WIDTH), dtype=np.uint8)
+    for pos in range(EMAIL_TAG_WIDTH - 1, -1, -1):
+        digits[:, pos] = _BASE36[(values % np.uint64(36)).astype(np.intp)]
+        values //= np.uint64(36)
+    return [tag.decode() for tag in digits.view(f'S{EMAIL_TAG_WIDTH}').ravel()]
+
+
+def allocate_emails(ids, sample_emails, seed):
+    """
+    Builds unique addresses as <local>.<tag>@<domain>. The tag follows the last dot of the
+    local part and has no dots itself, so two different ids can never produce the same address.
+    """
+    emails = []
+    for email, tag in zip(sample_emails, email_tags(ids, seed)):
+        local, domain = email.split('@', 1)
+        emails.append(f'{local}.{tag}@{domain}')
+    return emails
+
+
+def _to_csv(rows):
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator='\r\n').writerows(rows)
+    return buf.getvalue()
+
+
+def _books_shard(args):
+    seed, start, stop = args
+    rng = _shard_rng(seed, BOOKS, start)
+    n = stop - start
+    return {
+        'book_id': np.arange(start + 1, stop + 1),
+        'title': _pools['titles'][rng.integers(0, len(_pools['titles']), n)],
+        'author': _pools['names'][rng.integers(0, len(_pools['names']), n)],
+        'year': rng.integers(1900, 2024, n),
+        'genre': np.array(GENRES, dtype=object)[rng.integers(0, len(GENRES), n)],
+    }
+
+
+def _borrowers_shard(args):
+    seed, start, stop = args
+    rng = _shard_rng(seed, BORROWERS, start)
+    n = stop - start
+    names = _pools['names'][rng.integers(0, len(_pools['names']), n)]
+    samples = _pools['emails'][rng.integers(0, len(_pools['emails']), n)]
+    ids = np.arange(start + 1, stop + 1)
+    return {'borrower_id': ids, 'name': names, 'email': allocate_emails(ids, samples, seed)}
+
+
+def _transactions_shard(args):
+    seed, start, stop, num_books, num_borrowers, end_day = args
+    rng = _shard_rng(seed, TRANSACTIONS, start)
+    n = stop - start
+    book_ids = rng.integers(1, num_books + 1, n)
+    borrower_ids = rng.integers(1, num_borrowers + 1, n)
+    # Borrow dates fall within the last two years; return dates between borrow date and end_day.
+    borrow_days = end_day - rng.integers(0, 731, n)
+    return_days = borrow_days + rng.integers(0, end_day - borrow_days + 1)
+    return {
+        'transaction_id': np.arange(start + 1, stop + 1),
+        'book_id': book_ids,
+        'borrower_id': borrower_ids,
+        'borrow_date': borrow_days.astype('datetime64[D]'),
+        'return_date': return_days.astype('datetime64[D]'),
+    }
+
+
+def _render_shard(args):
+    """Runs one shard and returns its CSV text, plus the raw columns when a columnar copy is wanted."""
+    shard_fn, shard_args, columnar = args
+    columns = shard_fn(shard_args)
+    rows = zip(*[col.astype(str) if col.dtype.kind == 'M' else (col.tolist() if col.dtype.kind == 'i' else col)
+                 for col in map(np.asarray, columns.values())])
+    return _to_csv(rows), (columns if columnar else None)
+
+
+def _write_table(filename, table, shard_fn, shard_args, pools, workers, columnar=False):
+    """
+    Writes the header and then each shard's CSV text in shard order.
+    With workers > 1 the shards are generated in a process pool and streamed out as they complete.
+    With columnar=True the same shards are also appended to the typed columnar copy (see columnar.py).
+    """
+    fieldnames = [name for name, _ in TABLE_SCHEMAS[table]]
+    tasks = [(shard_fn, args, columnar) for args in shard_args]
+    with ExitStack() as stack:
+        # Entered first so it closes last: schema.json must not be older than the CSV (see columnar.exists)
+        writer = stack.enter_context(ColumnarWriter(filename, table)) if columnar else None
+        csvfile = stack.enter_context(open(filename, 'w', newline=''))
+        csvfile.write(','.join(fieldnames) + '\r\n')
+        if workers > 1 and len(tasks) > 1:
+            executor = stack.enter_context(
+                ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pools,)))
+            results = executor.map(_render_shard, tasks)
+        else:
+            _init_worker(pools)
+            results = map(_render_shard, tasks)
+        for text, columns in results:
+            csvfile.write(text)
+            if writer is not None:
+                writer.write_columns(columns)
+
+
+def _shards(n, chunk_size):
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+
+def generate_books(n, filename, seed=42, workers=1, chunk_size=CHUNK_SIZE, columnar=False):
+    shard_args = [(seed, start, stop) for start, stop in _shards(n, chunk_size)]
+    _write_table(filename, 'books',
+                 _books_shard, shard_args, build_pools(seed), workers, columnar)
+
+
+def generate_borrowers(n, filename, seed=42, workers=1, chunk_size=CHUNK_SIZE, columnar=False):
+    shard_args = [(seed, start, stop) for start, stop in _shards(n, chunk_size)]
+    _write_table(filename, 'borrowers',
+                 _borrowers_shard, shard_args, build_pools(seed), workers, columnar)
+
+
+def generate_transactions(n, filename, num_books, num_borrowers, seed=42, workers=1,
+                          chunk_size=CHUNK_SIZE, end_date=None, columnar=False):
+    # end_date anchors the "last two years" window; pass it explicitly for reproducible dates.
+    end_day = (end_date or datetime.date.today()).toordinal() - datetime.date(1970, 1, 1).toordinal()
+    shard_args = [(seed, start, stop, num_books, num_borrowers, end_day)
+                  for start, stop in _shards(n, chunk_size)]
+    _write_table(filename, 'transactions',
+                 _transactions_shard, shard_args, build_pools(seed), workers, columnar)
+
 
 if __name__ == "__main__":
     # You can adjust these numbers to generate datasets of different sizes.
@@ -59,6 +206,11 @@ if __name__ == "__main__":
     num_borrowers = 1000
     num_transactions = 2000  # Adjust based on your needs
 
-    generate_books(num_books, 'books.csv')
-    generate_borrowers(num_borrowers, 'borrowers.csv')
-    generate_transactions(num_transactions, 'transactions.csv', num_books, num_borrowers)
+    seed = 42  # Same seed and chunk size always produce the same files
+    workers = os.cpu_count() or 1
+    columnar = True  # Also write the memory-mappable <name>.cols copies read by columnar.load_batches
+
+    generate_books(num_books, 'books.csv', seed=seed, workers=workers, columnar=columnar)
+    generate_borrowers(num_borrowers, 'borrowers.csv', seed=seed, workers=workers, columnar=columnar)
+    generate_transactions(num_transactions, 'transactions.csv', num_books, num_borrowers,
+                          seed=seed, workers=workers, columnar=columnar)
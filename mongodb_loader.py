@@ -0,0 +1,111 @@
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError
+
+from columnar import TABLE_SCHEMAS, batch_dicts, load_batches
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Documents per insert_many call.
+BATCH_SIZE = 5000
+
+# Threads submitting batches; at most 2 * WORKERS batches are held in memory at once.
+WORKERS = 4
+
+# Index strategy: "before" builds the indexes on empty collections, "after" builds them once
+# the data is in (usually faster overall), "none" leaves indexing to the caller.
+INDEX_STRATEGIES = ("before", "after", "none")
+
+TABLES = ["books", "borrowers", "transactions"]
+
+# Lookup keys used by the $lookup stages of the benchmark pipelines.
+INDEXES = {
+    "books": ["book_id"],
+    "borrowers": ["borrower_id"],
+    "transactions": ["book_id", "borrower_id"],
+}
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None where the resource module is missing."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def create_indexes(db):
+    start = time.time()
+    for table, fields in INDEXES.items():
+        for field in fields:
+            db[table].create_index([(field, ASCENDING)])
+    print(f"Indexes created in {time.time() - start:.2f} s.")
+
+
+def _insert(collection, documents):
+    """Unordered insert; a failing document does not stop the rest of the batch."""
+    try:
+        return len(collection.insert_many(documents, ordered=False).inserted_ids), 0
+    except BulkWriteError as e:
+        return e.details.get("nInserted", 0), len(e.details.get("writeErrors", []))
+
+
+def load_collection(collection, table, stem, batch_size=BATCH_SIZE, workers=WORKERS):
+    """
+    Streams stem into collection in fixed-size batches submitted from a thread pool.
+    The number of batches in flight is bounded, so memory does not grow with the file.
+    Returns (documents, seconds).
+    """
+    schema = TABLE_SCHEMAS[table]
+    inserted = errors = 0
+    in_flight = deque()
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for batch in load_batches(stem, batch_size, table):
+            if len(in_flight) >= 2 * workers:
+                n, e = in_flight.popleft().result()
+                inserted += n
+                errors += e
+            in_flight.append(executor.submit(_insert, collection, batch_dicts(batch, schema)))
+        for future in in_flight:
+            n, e = future.result()
+            inserted += n
+            errors += e
+    elapsed = time.time() - start
+    rate = inserted / elapsed if elapsed > 0 else float("inf")
+    rss = peak_rss_mb()
+    rss_text = f", peak RSS {rss:.1f} MB" if rss is not None else ""
+    print(f"{table}: {inserted} documents from {stem} in {elapsed:.2f} s ({rate:.0f} docs/s{rss_text})"
+          + (f", {errors} write errors" if errors else ""))
+    return inserted, elapsed
+
+
+def load_dataset(db, suffix=None, batch_size=BATCH_SIZE, workers=WORKERS, index_strategy="after", clear=True):
+    """
+    Loads books, borrowers and transactions from <table>_<suffix> (or <table> when suffix is None).
+    Returns {table: (documents, seconds)}.
+    """
+    if index_strategy not in INDEX_STRATEGIES:
+        raise ValueError(f"Unknown index strategy {index_strategy!r}; expected one of {INDEX_STRATEGIES}")
+    if clear:
+        # Dropping is much cheaper than delete_many on large collections; indexes are rebuilt below.
+        for table in TABLES:
+            db[table].drop()
+        print("Collections cleared.")
+    if index_strategy == "before":
+        create_indexes(db)
+    stats = {}
+    for table in TABLES:
+        stem = f"{table}_{suffix}" if suffix else table
+        stats[table] = load_collection(db[table], table, stem, batch_size, workers)
+    if index_strategy == "after":
+        create_indexes(db)
+    return stats
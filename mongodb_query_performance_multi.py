@@ -1,7 +1,10 @@
+import re
 import time
 import statistics
-import csv
-from pymongo import MongoClient
+import connections
+import consumption
+import mongodb_loader
+from pymongo.errors import OperationFailure
 
 # Set dataset size label (e.g., "250k", "500k", "750k", or "1000k")
 dataset_size = "250k"  # Change as needed
@@ -14,61 +17,43 @@ csv_mapping = {
     "1000k": "100"
 }
 
+# Loader settings: documents per insert_many, submitting threads, and index build "before" or "after" the load
+load_batch_size = 5000
+load_workers = 4
+load_index_strategy = "after"
+
+# Result consumption compared after the timed runs (see consumption.py): "materialize" lists the
+# whole aggregation cursor; "stream" iterates it with batchSize stream_batch_size, so the client
+# holds one batch at a time. Peak client memory is traced per mode (consumption.traced_peak_mb).
+consumption_modes = ["stream", "materialize"]
+stream_batch_size = 1000
+
 def load_data_from_csv(dataset_size, db):
     """
     Clears the MongoDB collections and loads data from the CSV subset files
     based on the given dataset size.
     Expected CSV files: books_<suffix>.csv, borrowers_<suffix>.csv, transactions_<suffix>.csv
+    Documents are streamed in load_batch_size batches by mongodb_loader (see load_* settings above).
     """
     suffix = csv_mapping.get(dataset_size, "25")
     print(f"Dataset size is: {dataset_size} and suffix is: {suffix}")
-    books_file = f"books_{suffix}.csv"
-    borrowers_file = f"borrowers_{suffix}.csv"
-    transactions_file = f"transactions_{suffix}.csv"
-    
-    # Clear existing data
-    db.books.delete_many({})
-    db.borrowers.delete_many({})
-    db.transactions.delete_many({})
-    print("Collections cleared.")
-    
-    # Insert Books
-    with open(books_file, "r") as f:
-        reader = csv.DictReader(f)
-        books_list = []
-        for row in reader:
-            row["book_id"] = int(row["book_id"])
-            row["year"] = int(row["year"])
-            books_list.append(row)
-        if books_list:
-            db.books.insert_many(books_list)
-    print(f"Books inserted successfully from {books_file}.")
-    
-    # Insert Borrowers
-    with open(borrowers_file, "r") as f:
-        reader = csv.DictReader(f)
-        borrowers_list = []
-        for row in reader:
-            row["borrower_id"] = int(row["borrower_id"])
-            borrowers_list.append(row)
-        if borrowers_list:
-            db.borrowers.insert_many(borrowers_list)
-    print(f"Borrowers inserted successfully from {borrowers_file}.")
-    
-    # Insert Transactions
-    with open(transactions_file, "r") as f:
-        reader = csv.DictReader(f)
-        transactions_list = []
-        for row in reader:
-            row["transaction_id"] = int(row["transaction_id"])
-            row["book_id"] = int(row["book_id"])
-            row["borrower_id"] = int(row["borrower_id"])
-            transactions_list.append(row)
-        if transactions_list:
-            db.transactions.insert_many(transactions_list)
-    print(f"Transactions inserted successfully from {transactions_file}.")
+    mongodb_loader.load_dataset(db, suffix, batch_size=load_batch_size, workers=load_workers,
+                                index_strategy=load_index_strategy)
+
+def plan_cache(collection):
+    """(entries, active entries) in the collection's plan cache, or None if $planCacheStats is not allowed."""
+    try:
+        entries = list(collection.aggregate([{"$planCacheStats": {}}]))
+    except OperationFailure:
+        return None
+    return len(entries), sum(1 for entry in entries if entry.get("isActive"))
 
 def measure_pipeline(pipeline, collection):
+    """
+    Returns first, average and 95% CI times in ms, plus the collection's plan cache (entries, active)
+    before the cold run and after all runs, to show whether the runs planned once and reused the plan.
+    """
+    cache_before = plan_cache(collection)
     times = []
     # Cold run
     start = time.time()
@@ -81,13 +66,23 @@ def measure_pipeline(pipeline, collection):
         times.append((time.time() - start) * 1000)
     avg_time = sum(times) / len(times)
     conf_interval = 1.96 * statistics.stdev(times) / (len(times) ** 0.5)
-    return first_time, avg_time, conf_interval
+    return first_time, avg_time, conf_interval, (cache_before, plan_cache(collection))
+
+def consume_pipeline(pipeline, collection, mode):
+    """measure_consumption over the pipeline, consuming its cursor as mode says."""
+    def execute():
+        if mode == "materialize":
+            return list(collection.aggregate(pipeline))
+        return collection.aggregate(pipeline, batchSize=stream_batch_size)
+    return consumption.measure_consumption(lambda: consumption.consume(execute))
 
 if __name__ == "__main__":
     # Prompt the user for a borrower name pattern for Query1 (e.g., "S" for names starting with S)
     name_pattern = input("Enter the borrower name pattern (e.g., 'S' for names starting with S): ")
     
-    client = MongoClient("mongodb://localhost:27017/")
+    # Long-lived pooled client (see connections.py); opening it is reported apart from query times
+    client = connections.mongo_client()
+    connections.handshake_report()
     db = client["library"]
 
     print(f"Dataset Size: {dataset_size}")
@@ -95,11 +90,21 @@ if __name__ == "__main__":
     # Load the appropriate data into MongoDB based on dataset_size.
     load_data_from_csv(dataset_size, db)
     
+    # Query parameters. The pipelines below keep the same shape for any values (MongoDB plans by
+    # shape), and the user's pattern is escaped so it is matched literally rather than as a regex.
+    params = {
+        "name_prefix": "^" + re.escape(name_pattern),
+        "genre": "Fiction",
+        "limit": 5,
+        "since": "2022-01-01",
+        "min_count": 2,
+    }
+
     # Define four aggregation pipelines corresponding to four queries.
     # Query1: Return borrowers whose names start with the input pattern.
     queries = {
         "Query1": [
-            {"$match": {"name": {"$regex": f"^{name_pattern}", "$options": "i"}}},
+            {"$match": {"name": {"$regex": params["name_prefix"], "$options": "i"}}},
             {"$project": {"_id": 0, "name": 1}}
         ],
         "Query2": [
@@ -117,13 +122,13 @@ if __name__ == "__main__":
                 "as": "book"
             }},
             {"$unwind": "$book"},
-            {"$match": {"book.genre": "Fiction"}},
+            {"$match": {"book.genre": params["genre"]}},
             {"$group": {"_id": "$borrower_id", "name": {"$first": "$name"}, "borrow_count": {"$sum": 1}}}
         ],
         "Query3": [
             {"$group": {"_id": "$book_id", "borrow_count": {"$sum": 1}}},
             {"$sort": {"borrow_count": -1}},
-            {"$limit": 5},
+            {"$limit": params["limit"]},
             {"$lookup": {
                 "from": "books",
                 "localField": "_id",
@@ -134,9 +139,9 @@ if __name__ == "__main__":
             {"$project": {"title": "$book.title", "borrow_count": 1, "_id": 0}}
         ],
         "Query4": [
-            {"$match": {"borrow_date": {"$gte": "2022-01-01"}}},  # Adjust this date if needed
+            {"$match": {"borrow_date": {"$gte": params["since"]}}},
             {"$group": {"_id": "$borrower_id", "count": {"$sum": 1}}},
-            {"$match": {"count": {"$gt": 2}}},
+            {"$match": {"count": {"$gt": params["min_count"]}}},
             {"$lookup": {
                 "from": "borrowers",
                 "localField": "_id",
@@ -162,21 +167,35 @@ if __name__ == "__main__":
         ]
     }
     
+    # For Query1 and Query2, run on the "borrowers" collection;
+    # For Query3 and Query4, run on the "transactions" collection.
+    collections = {
+        "Query1": db["borrowers"],
+        "Query2": db["borrowers"],
+        "Query3": db["transactions"],
+        "Query4": db["transactions"],
+    }
+
     # Run performance tests for each query.
     for query_name, pipeline in queries.items():
-        # For Query1 and Query2, run on the "borrowers" collection;
-        # For Query3 and Query4, run on the "transactions" collection.
-        if query_name in ["Query1", "Query2"]:
-            collection = db["borrowers"]
-        else:
-            collection = db["transactions"]
+        collection = collections[query_name]
 
-        first_time, avg_time, conf_interval = measure_pipeline(pipeline, collection)
+        first_time, avg_time, conf_interval, (cache_before, cache_after) = measure_pipeline(pipeline, collection)
         print(f"\n{query_name} Performance:")
         print(f"  First Execution Time: {first_time:.2f} ms")
         print(f"  Average Execution Time: {avg_time:.2f} ms")
         print(f"  95% Confidence Interval: ±{conf_interval:.2f} ms")
+        if cache_before is not None:
+            print(f"  Plan cache ({collection.name}): {cache_before[0]} entries before, "
+                  f"{cache_after[0]} after ({cache_after[1]} active)")
     
+    # Materialized vs streamed consumption of each query's result
+    print()
+    for query_name, pipeline in queries.items():
+        for mode in consumption_modes:
+            stats = consume_pipeline(pipeline, collections[query_name], mode)
+            consumption.print_consumption(query_name, mode, stats)
+
     # After running all queries, print the sorted list of borrowers for Query1.
     # Run Query1 on the borrowers collection.
     query1_results = list(db.borrowers.aggregate(queries["Query1"]))
@@ -188,4 +207,4 @@ if __name__ == "__main__":
     else:
         print(f"\nNo borrowers found with names starting with '{name_pattern}'.")
     
-    client.close()
+    connections.close_all()
@@ -1,70 +1,29 @@
-import csv
-import mysql.connector
+from mysql_loader import connect, bulk_load
+from mysql_schema import create_schema
+from mysql_summaries import rebuild
 
-def clear_tables(cursor, conn):
-    # Disable foreign key checks to allow deletion
-    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
-    cursor.execute("DELETE FROM transactions")
-    cursor.execute("DELETE FROM borrowers")
-    cursor.execute("DELETE FROM books")
-    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-    conn.commit()
-    print("Tables cleared.")
+# Load mode and batch size for mysql_loader.bulk_load ("executemany", "multirow" or "infile")
+load_mode = "executemany"
+batch_size = 5000
 
-def insert_books(cursor, conn):
-    with open('books_25.csv', 'r') as csvfile:
-        next(csvfile)  # Skip header
-        reader = csv.reader(csvfile)
-        for row in reader:
-            cursor.execute(
-                "INSERT INTO books (book_id, title, author, year, genre) VALUES (%s, %s, %s, %s, %s)", row
-            )
-    conn.commit()
-    print("Books inserted successfully.")
+# Secondary indexes to build after the load (see mysql_schema.PROFILES)
+index_profile = "all"
 
-def insert_borrowers(cursor, conn):
-    with open('borrowers_25.csv', 'r') as csvfile:
-        next(csvfile)  # Skip header
-        reader = csv.reader(csvfile)
-        for row in reader:
-            cursor.execute(
-                "INSERT INTO borrowers (borrower_id, name, email) VALUES (%s, %s, %s)", row
-            )
-    conn.commit()
-    print("Borrowers inserted successfully.")
-
-def insert_transactions(cursor, conn):
-    # Disable foreign key checks
-    cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
-    with open('transactions_25.csv', 'r') as csvfile:
-        next(csvfile)  # Skip header
-        reader = csv.reader(csvfile)
-        for row in reader:
-            cursor.execute(
-                "INSERT INTO transactions (transaction_id, book_id, borrower_id, borrow_date, return_date) VALUES (%s, %s, %s, %s, %s)", row
-            )
-    conn.commit()
-    # Re-enable foreign key checks
-    cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
-    print("Transactions inserted successfully.")
+# Range-partition transactions by borrow month (see mysql_schema.PARTITIONED_TRANSACTIONS)
+partitioned = False
 
 def main():
     # Database connection
-    conn = mysql.connector.connect(
-        host="127.0.0.1",
-        port=3307,
-        user="user",
-        password="userpassword",
-        database="library"
-    )
-    cursor = conn.cursor()
+    conn = connect()
+
+    # Creates the tables if they do not exist yet; indexes are built after the load
+    create_schema(conn, profile="none", partitioned=partitioned)
 
-    clear_tables(cursor, conn)
-    insert_books(cursor, conn)
-    insert_borrowers(cursor, conn)
-    insert_transactions(cursor, conn)
+    # Clears the tables, then loads the 25% subset with FK/unique checks deferred
+    bulk_load(conn, "25", mode=load_mode, batch_size=batch_size)
+    create_schema(conn, profile=index_profile, partitioned=partitioned)
+    rebuild(conn)
 
-    cursor.close()
     conn.close()
     print("25% subset data inserted into MySQL successfully!")
 
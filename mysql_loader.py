@@ -0,0 +1,162 @@
+import datetime
+import os
+import time
+
+import mysql.connector
+
+import mysql_schema
+from columnar import TABLE_SCHEMAS, days_to_dates, load_batches, load_rows
+from connections import MYSQL_CONFIG
+
+# Load modes:
+#   "executemany" - cursor.executemany per batch (the connector rewrites it into one multi-row INSERT)
+#   "multirow"    - an explicit INSERT ... VALUES (...), (...) statement per batch
+#   "infile"      - LOAD DATA LOCAL INFILE streaming the CSV file straight to the server
+#                   (needs local_infile=ON on the server; docker-compose.yml starts MySQL with it)
+LOAD_MODES = ("executemany", "multirow", "infile")
+BATCH_SIZE = 5000
+
+# Parents first so the tables can be cleared and loaded in dependency order.
+TABLES = ["books", "borrowers", "transactions"]
+
+
+def connect(**overrides):
+    """A standalone connection; the benchmark harness borrows pooled ones from connections.py."""
+    return mysql.connector.connect(**dict(MYSQL_CONFIG, **overrides))
+
+
+def columns_of(table):
+    return [name for name, _ in TABLE_SCHEMAS[table]]
+
+
+def insert_prefix(table):
+    return f"INSERT INTO {table} ({', '.join(columns_of(table))}) VALUES "
+
+
+def defer_checks(cursor):
+    """Turns off per-row foreign-key and unique checks for the duration of a bulk load."""
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+    cursor.execute("SET UNIQUE_CHECKS = 0")
+
+
+def restore_checks(cursor):
+    cursor.execute("SET UNIQUE_CHECKS = 1")
+    cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+
+def clear_tables(cursor, conn):
+    defer_checks(cursor)
+    for table in reversed(TABLES):
+        cursor.execute(f"TRUNCATE TABLE {table}")
+    restore_checks(cursor)
+    conn.commit()
+    print("Tables cleared.")
+
+
+def load_executemany(cursor, conn, table, stem, batch_size=BATCH_SIZE):
+    sql = insert_prefix(table) + "(" + ", ".join(["%s"] * len(columns_of(table))) + ")"
+    rows = 0
+    for batch in load_rows(stem, batch_size, table):
+        cursor.executemany(sql, batch)
+        rows += len(batch)
+    conn.commit()
+    return rows
+
+
+def load_multirow(cursor, conn, table, stem, batch_size=BATCH_SIZE):
+    row_placeholder = "(" + ", ".join(["%s"] * len(columns_of(table))) + ")"
+    rows = 0
+    statements = {}
+    for batch in load_rows(stem, batch_size, table):
+        # Only the last batch has a different size, so the statement text is built at most twice.
+        sql = statements.get(len(batch))
+        if sql is None:
+            sql = statements[len(batch)] = insert_prefix(table) + ", ".join([row_placeholder] * len(batch))
+        cursor.execute(sql, [value for row in batch for value in row])
+        rows += len(batch)
+    conn.commit()
+    return rows
+
+
+def load_infile(cursor, conn, table, stem, batch_size=None):
+    csv_file = os.path.abspath(stem if stem.endswith(".csv") else stem + ".csv")
+    with open(csv_file, "rb") as f:
+        line_end = "\\r\\n" if f.readline().endswith(b"\r\n") else "\\n"
+    cursor.execute(
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE {table} "
+        f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' "
+        f"LINES TERMINATED BY '{line_end}' IGNORE 1 LINES "
+        f"({', '.join(columns_of(table))})",
+        (csv_file,)
+    )
+    rows = cursor.rowcount
+    conn.commit()
+    return rows
+
+
+loaders = {
+    "executemany": load_executemany,
+    "multirow": load_multirow,
+    "infile": load_infile,
+}
+
+
+def borrow_date_range(stem):
+    """(first, last) borrow_date of transactions_<suffix>, as dates, or None when it is empty."""
+    first = last = None
+    for batch in load_batches(stem, table="transactions"):
+        days = batch["borrow_date"]
+        if len(days):
+            first = days.min() if first is None else min(first, days.min())
+            last = days.max() if last is None else max(last, days.max())
+    if first is None:
+        return None
+    return tuple(datetime.date.fromisoformat(day) for day in days_to_dates([first, last]))
+
+
+def load_table(cursor, conn, table, stem, mode="executemany", batch_size=BATCH_SIZE):
+    """Loads one table and reports rows per second. Returns (rows, seconds)."""
+    start = time.time()
+    rows = loaders[mode](cursor, conn, table, stem, batch_size)
+    elapsed = time.time() - start
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{table}: {rows} rows from {stem} in {elapsed:.2f} s ({rate:.0f} rows/s, mode={mode})")
+    return rows, elapsed
+
+
+def bulk_load(conn, suffix, mode="executemany", batch_size=BATCH_SIZE):
+    """
+    Clears the tables and loads books_<suffix>, borrowers_<suffix> and transactions_<suffix>.
+    Foreign-key and unique checks are deferred until every table is loaded. A month-partitioned
+    transactions table (see mysql_schema) is first re-partitioned to cover the file's borrow months.
+    Returns {table: (rows, seconds)}.
+    """
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode {mode!r}; expected one of {LOAD_MODES}")
+    cursor = conn.cursor()
+    clear_tables(cursor, conn)
+    if mysql_schema.is_partitioned(cursor):
+        date_range = borrow_date_range(f"transactions_{suffix}")
+        if date_range:
+            mysql_schema.partition_by_month(cursor, *date_range)
+    stats = {}
+    defer_checks(cursor)
+    try:
+        for table in TABLES:
+            stats[table] = load_table(cursor, conn, table, f"{table}_{suffix}", mode, batch_size)
+    finally:
+        restore_checks(cursor)
+        cursor.close()
+    total_rows = sum(rows for rows, _ in stats.values())
+    total_time = sum(secs for _, secs in stats.values())
+    if total_time > 0:
+        print(f"Loaded {total_rows} rows in {total_time:.2f} s ({total_rows / total_time:.0f} rows/s).")
+    return stats
+
+
+if __name__ == "__main__":
+    suffix = "25"  # "25", "50", "75" or "100"
+    mode = "infile"  # One of LOAD_MODES
+    conn = connect()
+    bulk_load(conn, suffix, mode)
+    conn.close()
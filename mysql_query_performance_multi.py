@@ -1,7 +1,10 @@
 import time
 import statistics
-import mysql.connector
-import csv
+import connections
+import consumption
+import mysql_loader
+import mysql_schema
+import mysql_summaries
 
 # Set this variable manually before each run based on the loaded dataset:
 # For example, set to "250k" if you want to load the 25% subset (which represents 250k records)
@@ -15,81 +18,66 @@ csv_mapping = {
     "1000k": "100"
 }
 
+# Bulk-load mode used by load_data_from_csv: "executemany", "multirow" or "infile" (LOAD DATA LOCAL INFILE)
+load_mode = "infile"
+load_batch_size = 5000
+
+# Index profiles (see mysql_schema.PROFILES) measured one after another on the same loaded data,
+# e.g. ["none", "borrower_date", "book", "genre", "query3_covering", "all"] to isolate each index
+index_profiles = ["none", "all"]
+
+# Pooled connections shared by the load, the measurements and fetch_borrowers (see connections.py);
+# the pool is opened once at startup, so connect/auth time is reported apart from query times
+pool_size = 5
+
+# Run the queries as server-side prepared statements (prepared once per measurement, then only
+# executed); False sends the same parameterized templates as text, parsed on every execution
+use_prepared = True
+
+# "live" aggregates Query2/Query3 from transactions on every run; "summary" reads the counts that
+# mysql_summaries maintains (refreshed after the load). Each listed mode is measured in turn.
+aggregation_modes = ["live", "summary"]
+
+# Range-partition transactions by borrow month (see mysql_schema.PARTITIONED_TRANSACTIONS), so
+# Query4's recent-window filter reads only the partitions it covers; False keeps one unpartitioned table.
+# Switching it recreates the transactions table.
+partition_transactions = True
+
+# Result consumption compared after the timed runs (see consumption.py): "materialize" fetches every
+# row with fetchall(); "stream" reads them stream_fetch_size at a time from an unbuffered cursor,
+# the connector's equivalent of an SSCursor, so the client never holds the whole result. Peak client
+# memory is traced per mode (consumption.traced_peak_mb).
+consumption_modes = ["stream", "materialize"]
+stream_fetch_size = 1000
+
 def load_data_from_csv(dataset_size):
     """
     Clears the MySQL tables and loads data from the CSV subset files corresponding to the given dataset size.
+    Uses mysql_loader.bulk_load with the module-level load_mode and load_batch_size, then rebuilds
+    the summary tables from the loaded transactions.
     """
     suffix = csv_mapping.get(dataset_size, "25")
     print(f"Dataset size is: {dataset_size} and suffix is: {suffix}")
-    books_file = f"books_{suffix}.csv"
-    borrowers_file = f"borrowers_{suffix}.csv"
-    transactions_file = f"transactions_{suffix}.csv"
-    
-    # Connect to MySQL
-    conn = mysql.connector.connect(
-        host="127.0.0.1",
-        port=3307,
-        user="user",
-        password="userpassword",
-        database="library"
-    )
-    cursor = conn.cursor()
-    
-    # Clear existing data
-    cursor.execute("DELETE FROM transactions;")
-    cursor.execute("DELETE FROM borrowers;")
-    cursor.execute("DELETE FROM books;")
-    conn.commit()
-    print("Tables cleared.")
-    
-    # Insert Books
-    with open(books_file, 'r') as f:
-        next(f)  # Skip header
-        reader = csv.reader(f)
-        for row in reader:
-            cursor.execute(
-                "INSERT INTO books (book_id, title, author, year, genre) VALUES (%s, %s, %s, %s, %s)", row
-            )
-    conn.commit()
-    print(f"Books inserted successfully from {books_file}.")
     
-    # Insert Borrowers
-    with open(borrowers_file, 'r') as f:
-        next(f)
-        reader = csv.reader(f)
-        for row in reader:
-            cursor.execute(
-                "INSERT INTO borrowers (borrower_id, name, email) VALUES (%s, %s, %s)", row
-            )
-    conn.commit()
-    print(f"Borrowers inserted successfully from {borrowers_file}.")
-    
-    # Insert Transactions with foreign key checks disabled
-    cursor.execute("SET FOREIGN_KEY_CHECKS=0;")
-    with open(transactions_file, 'r') as f:
-        next(f)
-        reader = csv.reader(f)
-        for row in reader:
-            cursor.execute(
-                "INSERT INTO transactions (transaction_id, book_id, borrower_id, borrow_date, return_date) VALUES (%s, %s, %s, %s, %s)", row
-            )
-    conn.commit()
-    cursor.execute("SET FOREIGN_KEY_CHECKS=1;")
-    print(f"Transactions inserted successfully from {transactions_file}.")
-    
-    cursor.close()
-    conn.close()
+    with connections.mysql_connection() as conn:
+        mysql_loader.bulk_load(conn, suffix, mode=load_mode, batch_size=load_batch_size)
+        mysql_summaries.rebuild(conn)
 
 # Prompt the user for a name pattern to dynamically update Query1
 name_pattern = input("Enter the borrower name pattern (e.g., 'S' for names starting with S): ")
 
-# Define the four queries with increasing complexity
-query1 = f"""
+def like_prefix(pattern):
+    """LIKE argument matching names that start with pattern, with %, _ and \\ taken literally."""
+    return pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+# Define the four queries with increasing complexity, as parameterized templates: the query text
+# never changes, only the parameters passed with it
+query1 = """
     SELECT DISTINCT br.name
     FROM books b 
     JOIN transactions t ON b.book_id = t.book_id 
     JOIN borrowers br ON t.borrower_id = br.borrower_id 
-    WHERE br.name LIKE '{name_pattern}%';
+    WHERE br.name LIKE %s
 """
 
 query2 = """
@@ -97,8 +85,8 @@ query2 = """
     FROM borrowers br 
     JOIN transactions t ON br.borrower_id = t.borrower_id 
     JOIN books b ON t.book_id = b.book_id 
-    WHERE b.genre = 'Fiction' 
-    GROUP BY br.borrower_id, br.name;
+    WHERE b.genre = %s 
+    GROUP BY br.borrower_id, br.name
 """
 
 query3 = """
@@ -107,7 +95,7 @@ query3 = """
     JOIN transactions t ON b.book_id = t.book_id 
     GROUP BY b.book_id, b.title 
     ORDER BY borrow_count DESC 
-    LIMIT 5;
+    LIMIT %s
 """
 
 query4 = """
@@ -118,35 +106,53 @@ query4 = """
     WHERE br.borrower_id IN (
         SELECT borrower_id 
         FROM transactions 
-        WHERE borrow_date >= DATE_SUB(CURDATE(), INTERVAL 1 YEAR) 
+        WHERE borrow_date >= DATE_SUB(CURDATE(), INTERVAL %s YEAR) 
         GROUP BY borrower_id 
-        HAVING COUNT(*) > 2
-    );
+        HAVING COUNT(*) > %s
+    )
+"""
+
+# Query2 and Query3 over the maintained summary tables (see mysql_summaries.py)
+query2_summary = """
+    SELECT br.name, s.borrow_count 
+    FROM borrower_genre_counts s 
+    JOIN borrowers br ON br.borrower_id = s.borrower_id 
+    WHERE s.genre = %s
+"""
+
+query3_summary = """
+    SELECT b.title, s.borrow_count 
+    FROM book_borrow_counts s 
+    JOIN books b ON b.book_id = s.book_id 
+    ORDER BY s.borrow_count DESC 
+    LIMIT %s
 """
 
+# Query name -> (template, parameters)
 queries = {
-    "Query1": query1,
-    "Query2": query2,
-    "Query3": query3,
-    "Query4": query4
+    "Query1": (query1, (like_prefix(name_pattern),)),
+    "Query2": (query2, ("Fiction",)),
+    "Query3": (query3, (5,)),
+    "Query4": (query4, (1, 2))
 }
 
-def fetch_borrowers(query):
-    # Connect to the MySQL database
-    conn = mysql.connector.connect(
-        host="127.0.0.1",
-        port=3307,
-        user="user",
-        password="userpassword",
-        database="library"
-    )
-    cursor = conn.cursor()
-    
-    # Execute the query
-    cursor.execute(query)
-    
-    # Fetch all matching results
-    results = cursor.fetchall()
+summary_queries = dict(queries, Query2=(query2_summary, ("Fiction",)), Query3=(query3_summary, (5,)))
+
+query_sets = {
+    "live": queries,
+    "summary": summary_queries,
+}
+
+def fetch_borrowers(query, params):
+    with connections.mysql_connection() as conn:
+        cursor = conn.cursor(prepared=use_prepared)
+        
+        # Execute the query
+        cursor.execute(query, params)
+        
+        # Fetch all matching results
+        results = cursor.fetchall()
+        cursor.close()
 
     # Print results in a cleaner format
     if results:
@@ -158,54 +164,130 @@ def fetch_borrowers(query):
                 print(row)
     else:
         print(f"No borrowers found with names starting with '{name_pattern}'.")
-    
-    cursor.close()
-    conn.close()
-
-def measure_query(query):
-    # Connect to your MySQL database (ensure it contains the current subset)
-    conn = mysql.connector.connect(
-        host="127.0.0.1",
-        port=3307,
-        user="user",
-        password="userpassword",
-        database="library"
-    )
+
+def explain(query, params):
+    """
+    Prints the EXPLAIN plan rows (table, access type, key, estimated rows) for a query. For a
+    partitioned table it also shows how many of its partitions the row reads (partition pruning).
+    """
+    with connections.mysql_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT table_name, COUNT(*) AS partitions FROM information_schema.partitions "
+            "WHERE table_schema = DATABASE() AND partition_name IS NOT NULL GROUP BY table_name"
+        )
+        partition_counts = {row["table_name"]: row["partitions"] for row in cursor.fetchall()}
+        cursor.execute("EXPLAIN " + query, params)
+        for row in cursor.fetchall():
+            pruning = ""
+            if row["partitions"]:
+                read = row["partitions"].split(",")
+                total = partition_counts.get(row["table"], len(read))
+                pruning = f" partitions={len(read)}/{total} ({read[0]}..{read[-1]})"
+            print(f"    {row['select_type']:<20} {row['table'] or '':<22} type={row['type']} "
+                  f"key={row['key']} rows={row['rows']}{pruning} {row['Extra'] or ''}")
+        cursor.close()
+
+statement_counters = ("Com_stmt_prepare", "Com_stmt_execute", "Com_stmt_reprepare")
+
+def session_counters(conn):
+    """Current values of the session's prepared-statement counters."""
     cursor = conn.cursor()
-    times = []
+    cursor.execute("SHOW SESSION STATUS WHERE Variable_name IN (%s, %s, %s)", statement_counters)
+    values = {name: int(value) for name, value in cursor.fetchall()}
+    cursor.close()
+    return values
 
-    # Cold run: measure the first execution time
-    start = time.time()
-    cursor.execute(query)
-    cursor.fetchall()
-    first_time = (time.time() - start) * 1000  # in ms
+def measure_query(query, params):
+    """
+    Returns first, average and 95% CI times in ms, plus how many statements the server prepared,
+    executed and had to re-prepare during the 31 runs (all zero with use_prepared = False).
+    """
+    # Borrow a pooled connection: the timings below contain no connect/auth cost
+    with connections.mysql_connection() as conn:
+        before = session_counters(conn)
+        cursor = conn.cursor(prepared=use_prepared)
+        times = []
 
-    # Run the query 30 additional times and record each execution time
-    for _ in range(30):
+        # Cold run: measure the first execution time
         start = time.time()
-        cursor.execute(query)
+        cursor.execute(query, params)
         cursor.fetchall()
-        times.append((time.time() - start) * 1000)
+        first_time = (time.time() - start) * 1000  # in ms
+
+        # Run the query 30 additional times and record each execution time
+        for _ in range(30):
+            start = time.time()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            times.append((time.time() - start) * 1000)
+        cursor.close()
+        after = session_counters(conn)
     avg_time = sum(times) / len(times)
     conf_interval = 1.96 * statistics.stdev(times) / (len(times) ** 0.5)
+    statements = {name: after.get(name, 0) - before.get(name, 0) for name in statement_counters}
+    return first_time, avg_time, conf_interval, statements
 
-    cursor.close()
-    conn.close()
-    return first_time, avg_time, conf_interval
+def stream_rows(cursor, fetch_size):
+    """Yields the pending result's rows, fetched fetch_size at a time."""
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+def consume_query(query, params, mode):
+    """measure_consumption over query on one pooled connection, consuming the rows as mode says."""
+    with connections.mysql_connection() as conn:
+        cursor = conn.cursor(prepared=use_prepared)
+
+        def execute():
+            cursor.execute(query, params)
+            return cursor.fetchall() if mode == "materialize" else stream_rows(cursor, stream_fetch_size)
+
+        stats = consumption.measure_consumption(lambda: consumption.consume(execute))
+        cursor.close()
+    return stats
 
 if __name__ == "__main__":
     print(f"Dataset Size: {dataset_size}")
+
+    # Open the connection pool up front and report the handshake cost on its own
+    connections.mysql_pool(pool_size)
+    connections.handshake_report()
     
+    # Create the tables if needed (without secondary indexes, so the load does not maintain them)
+    with connections.mysql_connection() as conn:
+        mysql_schema.create_schema(conn, profile="none", partitioned=partition_transactions)
+
     # Load the appropriate data from CSV files based on dataset_size.
     load_data_from_csv(dataset_size)
     
-    # Now run performance tests for each query
-    for query_name, query in queries.items():
-        first_time, avg_time, conf_interval = measure_query(query)
-        print(f"{query_name} Performance:")
-        print(f"  First Execution Time: {first_time:.2f} ms")
-        print(f"  Average Execution Time: {avg_time:.2f} ms")
-        print(f"  95% Confidence Interval: ±{conf_interval:.2f} ms\n")
+    # Now run performance tests for each query under each index profile
+    for profile in index_profiles:
+        with connections.mysql_connection() as conn:
+            mysql_schema.apply_profile(conn, profile)
+        print("Query4 plan:")
+        explain(*queries["Query4"])
+        for mode in aggregation_modes:
+            for query_name, (query, params) in query_sets[mode].items():
+                if mode != "live" and "live" in aggregation_modes and query_sets[mode][query_name] == queries[query_name]:
+                    continue  # Same query as in live mode, already measured
+                first_time, avg_time, conf_interval, statements = measure_query(query, params)
+                print(f"{query_name} Performance (index profile: {profile}, aggregation: {mode}):")
+                print(f"  First Execution Time: {first_time:.2f} ms")
+                print(f"  Average Execution Time: {avg_time:.2f} ms")
+                print(f"  95% Confidence Interval: ±{conf_interval:.2f} ms")
+                print(f"  Statements: {statements['Com_stmt_prepare']} prepared, "
+                      f"{statements['Com_stmt_execute']} executed, {statements['Com_stmt_reprepare']} re-prepared\n")
     
+    # Materialized vs streamed consumption of each query's result (last index profile, live aggregation)
+    for query_name, (query, params) in queries.items():
+        for mode in consumption_modes:
+            consumption.print_consumption(query_name, mode, consume_query(query, params, mode))
+
     # Fetch and display borrowers based on the name pattern using the modified Query1
-    fetch_borrowers(query1)
+    fetch_borrowers(*queries["Query1"])
+
+    # Pool checkouts (and any reconnects) over the whole run
+    connections.handshake_report()
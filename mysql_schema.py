@@ -0,0 +1,185 @@
+import datetime
+import sys
+import time
+
+import mysql.connector
+
+import mysql_summaries
+from connections import MYSQL_CONFIG
+
+# Tables with typed columns. There are no FOREIGN KEY constraints: InnoDB would add (and refuse to
+# drop) its own indexes on the referencing columns, which would make the index profiles below
+# meaningless. The loader only loads FK-closed subsets (see create_subsets.py).
+TABLES = {
+    "books": """
+        CREATE TABLE IF NOT EXISTS books (
+            book_id INT NOT NULL PRIMARY KEY,
+            title VARCHAR(255) NOT NULL,
+            author VARCHAR(255) NOT NULL,
+            year SMALLINT NOT NULL,
+            genre VARCHAR(64) NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    "borrowers": """
+        CREATE TABLE IF NOT EXISTS borrowers (
+            borrower_id INT NOT NULL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            email VARCHAR(255) NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    "transactions": """
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INT NOT NULL PRIMARY KEY,
+            book_id INT NOT NULL,
+            borrower_id INT NOT NULL,
+            borrow_date DATE NOT NULL,
+            return_date DATE NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+}
+
+# transactions range-partitioned by borrow month. Every unique key must contain the partitioning
+# column, hence the (transaction_id, borrow_date) primary key. It starts with a single catch-all
+# partition; the loader splits it into months covering the data (see partition_by_month), so a
+# recent-window filter on borrow_date only reads the last few partitions.
+PARTITIONED_TRANSACTIONS = """
+    CREATE TABLE IF NOT EXISTS transactions (
+        transaction_id INT NOT NULL,
+        book_id INT NOT NULL,
+        borrower_id INT NOT NULL,
+        borrow_date DATE NOT NULL,
+        return_date DATE NOT NULL,
+        PRIMARY KEY (transaction_id, borrow_date)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    PARTITION BY RANGE COLUMNS (borrow_date) (PARTITION pmax VALUES LESS THAN (MAXVALUE))"""
+
+# Secondary indexes the profiles are built from: name -> (table, columns).
+INDEXES = {
+    # Query4's IN (...) subquery and the borrower side of the Query1/2/4 joins
+    "idx_transactions_borrower_date": ("transactions", ["borrower_id", "borrow_date"]),
+    # Book side of the joins, and the GROUP BY book_id of Query3 (covered: InnoDB appends the PK)
+    "idx_transactions_book": ("transactions", ["book_id"]),
+    # Query2's genre = 'Fiction' filter, with book_id for the join
+    "idx_books_genre_book": ("books", ["genre", "book_id"]),
+    # Covering index for Query3's title lookup: the top books' titles come from this narrow index
+    # instead of the clustered rows, which also hold author, year and genre
+    "idx_books_book_title": ("books", ["book_id", "title"]),
+}
+
+# Named index sets; apply_profile makes exactly these secondary indexes exist.
+PROFILES = {
+    "none": [],
+    "borrower_date": ["idx_transactions_borrower_date"],
+    "book": ["idx_transactions_book"],
+    "genre": ["idx_books_genre_book"],
+    "query3_covering": ["idx_transactions_book", "idx_books_book_title"],
+    "all": list(INDEXES),
+}
+
+
+def is_partitioned(cursor, table="transactions"):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.partitions "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL",
+        (table,)
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def table_exists(cursor, table):
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s",
+        (table,)
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def create_tables(cursor, drop=False, partitioned=False):
+    """
+    Creates the source tables (transactions month-partitioned with partitioned=True) and the summary
+    tables of mysql_summaries. An existing transactions table with the other layout is recreated.
+    """
+    if drop:
+        for table in [*mysql_summaries.SUMMARY_TABLES, *reversed(list(TABLES))]:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    elif table_exists(cursor, "transactions") and is_partitioned(cursor) != partitioned:
+        cursor.execute("DROP TABLE transactions")
+    for table, ddl in TABLES.items():
+        cursor.execute(PARTITIONED_TRANSACTIONS if table == "transactions" and partitioned else ddl)
+    mysql_summaries.create_summary_tables(cursor)
+
+
+def month_partitions(first, last):
+    """PARTITION clauses for every month from first's to last's (dates), plus a catch-all pmax."""
+    clauses = []
+    year, month = first.year, first.month
+    while (year, month) <= (last.year, last.month):
+        upper = datetime.date(year + 1, 1, 1) if month == 12 else datetime.date(year, month + 1, 1)
+        clauses.append(f"PARTITION p{year:04d}{month:02d} VALUES LESS THAN ('{upper.isoformat()}')")
+        year, month = upper.year, upper.month
+    clauses.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+    return clauses
+
+
+def partition_by_month(cursor, first, last):
+    """
+    Re-partitions transactions into one partition per month from first to last. Rows before first
+    land in the first month's partition and rows after last in pmax. Instant on an empty table.
+    """
+    cursor.execute(f"ALTER TABLE transactions PARTITION BY RANGE COLUMNS (borrow_date) "
+                   f"({', '.join(month_partitions(first, last))})")
+    print(f"transactions partitioned by month: {first:%Y-%m} to {last:%Y-%m} (+ pmax)")
+
+
+def existing_indexes(cursor):
+    """Names of the INDEXES entries currently present in the database."""
+    cursor.execute(
+        "SELECT DISTINCT index_name FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND index_name <> 'PRIMARY'"
+    )
+    return {name for (name,) in cursor.fetchall() if name in INDEXES}
+
+
+def apply_profile(conn, profile):
+    """
+    Drops the managed indexes not in the profile, creates the missing ones, and refreshes the
+    table statistics so the optimizer sees the change. Returns {index: build seconds}.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown index profile {profile!r}; expected one of {list(PROFILES)}")
+    wanted = set(PROFILES[profile])
+    cursor = conn.cursor()
+    present = existing_indexes(cursor)
+    for name in sorted(present - wanted):
+        table, _ = INDEXES[name]
+        cursor.execute(f"DROP INDEX {name} ON {table}")
+    built = {}
+    for name in PROFILES[profile]:
+        if name in present:
+            continue
+        table, columns = INDEXES[name]
+        start = time.time()
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({', '.join(columns)})")
+        built[name] = time.time() - start
+    for table in TABLES:
+        cursor.execute(f"ANALYZE TABLE {table}")
+        cursor.fetchall()
+    cursor.close()
+    print(f"Index profile {profile!r}: {', '.join(PROFILES[profile]) or 'no secondary indexes'}"
+          + "".join(f"; built {name} in {secs:.2f} s" for name, secs in built.items()))
+    return built
+
+
+def create_schema(conn, profile="none", drop=False, partitioned=False):
+    """Creates the tables (dropping them first with drop=True) and applies an index profile."""
+    cursor = conn.cursor()
+    create_tables(cursor, drop, partitioned)
+    cursor.close()
+    conn.commit()
+    return apply_profile(conn, profile)
+
+
+if __name__ == "__main__":
+    # python mysql_schema.py [profile] [partitioned]  -> create the tables if missing and apply the index profile
+    profile = sys.argv[1] if len(sys.argv) > 1 else "all"
+    partitioned = len(sys.argv) > 2 and sys.argv[2] == "partitioned"
+    conn = mysql.connector.connect(**MYSQL_CONFIG)
+    create_schema(conn, profile, partitioned=partitioned)
+    conn.close()
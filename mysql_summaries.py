@@ -0,0 +1,122 @@
+import time
+
+import mysql.connector
+
+from connections import MYSQL_CONFIG
+
+# Summary tables for Query2 and Query3, maintained incrementally:
+#   borrower_genre_counts  (borrower_id, genre) -> transactions of that genre
+#   book_borrow_counts     book_id -> transactions
+#   summary_refresh        high-water mark: the largest transaction_id already counted
+# refresh() folds in only the transactions above the high-water mark, so it is cheap to run after
+# every batch of new transactions. It assumes new transactions get larger ids than existing ones.
+SUMMARY_TABLES = {
+    "borrower_genre_counts": """
+        CREATE TABLE IF NOT EXISTS borrower_genre_counts (
+            borrower_id INT NOT NULL,
+            genre VARCHAR(64) NOT NULL,
+            borrow_count INT NOT NULL,
+            PRIMARY KEY (borrower_id, genre),
+            KEY idx_genre (genre, borrower_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    "book_borrow_counts": """
+        CREATE TABLE IF NOT EXISTS book_borrow_counts (
+            book_id INT NOT NULL PRIMARY KEY,
+            borrow_count INT NOT NULL,
+            KEY idx_borrow_count (borrow_count)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+    "summary_refresh": """
+        CREATE TABLE IF NOT EXISTS summary_refresh (
+            name VARCHAR(64) NOT NULL PRIMARY KEY,
+            high_water INT NOT NULL
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4""",
+}
+
+MARK = "transactions"
+
+# Each statement adds the counts of the transactions in (%s, %s] to the stored counts.
+REFRESH_STATEMENTS = [
+    """
+    INSERT INTO borrower_genre_counts (borrower_id, genre, borrow_count)
+    SELECT * FROM (
+        SELECT t.borrower_id, b.genre, COUNT(*) AS borrow_count
+        FROM transactions t
+        JOIN books b ON b.book_id = t.book_id
+        WHERE t.transaction_id > %s AND t.transaction_id <= %s
+        GROUP BY t.borrower_id, b.genre
+    ) AS new
+    ON DUPLICATE KEY UPDATE borrow_count = borrower_genre_counts.borrow_count + new.borrow_count
+    """,
+    """
+    INSERT INTO book_borrow_counts (book_id, borrow_count)
+    SELECT * FROM (
+        SELECT book_id, COUNT(*) AS borrow_count
+        FROM transactions
+        WHERE transaction_id > %s AND transaction_id <= %s
+        GROUP BY book_id
+    ) AS new
+    ON DUPLICATE KEY UPDATE borrow_count = book_borrow_counts.borrow_count + new.borrow_count
+    """,
+]
+
+
+def create_summary_tables(cursor):
+    for ddl in SUMMARY_TABLES.values():
+        cursor.execute(ddl)
+
+
+def clear(cursor):
+    for table in SUMMARY_TABLES:
+        cursor.execute(f"TRUNCATE TABLE {table}")
+
+
+def refresh(conn):
+    """
+    Adds the transactions above the high-water mark to the summaries and advances the mark, in one
+    transaction. If the transactions table was emptied or reloaded below the mark, rebuilds instead;
+    after reloading the same data (same ids), call rebuild() directly.
+    Returns (transactions counted, seconds).
+    """
+    start = time.time()
+    # End any open read transaction so the counts below come from a fresh snapshot
+    conn.commit()
+    cursor = conn.cursor()
+    cursor.execute("INSERT IGNORE INTO summary_refresh (name, high_water) VALUES (%s, 0)", (MARK,))
+    cursor.execute("SELECT high_water FROM summary_refresh WHERE name = %s FOR UPDATE", (MARK,))
+    (high_water,) = cursor.fetchone()
+    cursor.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions")
+    (max_id,) = cursor.fetchone()
+    if max_id < high_water:
+        conn.rollback()
+        cursor.close()
+        return rebuild(conn)
+    cursor.execute("SELECT COUNT(*) FROM transactions WHERE transaction_id > %s", (high_water,))
+    (pending,) = cursor.fetchone()
+    if pending:
+        for statement in REFRESH_STATEMENTS:
+            cursor.execute(statement, (high_water, max_id))
+        cursor.execute("UPDATE summary_refresh SET high_water = %s WHERE name = %s", (max_id, MARK))
+    conn.commit()
+    cursor.close()
+    elapsed = time.time() - start
+    print(f"Summaries refreshed: {pending} new transactions (high-water mark {high_water} -> {max_id}) "
+          f"in {elapsed:.2f} s")
+    return pending, elapsed
+
+
+def rebuild(conn):
+    """Empties the summaries, resets the high-water mark and recounts every transaction."""
+    cursor = conn.cursor()
+    clear(cursor)
+    cursor.close()
+    conn.commit()
+    return refresh(conn)
+
+
+if __name__ == "__main__":
+    conn = mysql.connector.connect(**MYSQL_CONFIG)
+    cursor = conn.cursor()
+    create_summary_tables(cursor)
+    cursor.close()
+    refresh(conn)
+    conn.close()
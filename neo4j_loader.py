@@ -0,0 +1,92 @@
+import time
+
+from columnar import TABLE_SCHEMAS, batch_dicts, load_batches
+
+# Rows sent per UNWIND transaction.
+BATCH_SIZE = 10_000
+
+# Nodes deleted per inner transaction when clearing the graph.
+CLEAR_BATCH_SIZE = 10_000
+
+# Uniqueness constraints (and their backing indexes) created before any data is loaded,
+# so the MATCH lookups in the relationship phase are index seeks instead of label scans.
+CONSTRAINTS = [
+    "CREATE CONSTRAINT book_id_unique IF NOT EXISTS FOR (b:Book) REQUIRE b.book_id IS UNIQUE",
+    "CREATE CONSTRAINT borrower_id_unique IF NOT EXISTS FOR (br:Borrower) REQUIRE br.borrower_id IS UNIQUE",
+]
+
+BOOKS_QUERY = """
+    UNWIND $rows AS row
+    CREATE (:Book {book_id: row.book_id, title: row.title, author: row.author, year: row.year, genre: row.genre})
+"""
+
+BORROWERS_QUERY = """
+    UNWIND $rows AS row
+    CREATE (:Borrower {borrower_id: row.borrower_id, name: row.name, email: row.email})
+"""
+
+BORROWED_QUERY = """
+    UNWIND $rows AS row
+    MATCH (b:Book {book_id: row.book_id})
+    MATCH (br:Borrower {borrower_id: row.borrower_id})
+    CREATE (br)-[:BORROWED {transaction_id: row.transaction_id, borrow_date: row.borrow_date,
+                            return_date: row.return_date}]->(b)
+"""
+
+
+def clear_graph(session, batch_size=CLEAR_BATCH_SIZE):
+    """Deletes every node and relationship, batch_size nodes per transaction."""
+    # CALL { ... } IN TRANSACTIONS needs an auto-commit transaction, hence session.run.
+    session.run(f"""
+        MATCH (n)
+        CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF {batch_size} ROWS
+    """).consume()
+    print("Database cleared.")
+
+
+def create_constraints(session):
+    for statement in CONSTRAINTS:
+        session.run(statement).consume()
+    # Wait for the backing indexes to come online before they are relied on.
+    session.run("CALL db.awaitIndexes(300)").consume()
+    print("Constraints created.")
+
+
+def run_batches(session, query, table, stem, batch_size=BATCH_SIZE):
+    """
+    Sends stem in UNWIND batches, one explicit write transaction per batch,
+    printing the time of each batch. Returns (rows, seconds).
+    """
+    rows = 0
+    start = time.time()
+    for i, batch in enumerate(load_batches(stem, batch_size, table)):
+        params = batch_dicts(batch, TABLE_SCHEMAS[table])
+        batch_start = time.time()
+        session.execute_write(lambda tx: tx.run(query, rows=params).consume())
+        rows += len(params)
+        print(f"{table} batch {i + 1}: {len(params)} rows in {(time.time() - batch_start) * 1000:.1f} ms")
+    elapsed = time.time() - start
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    print(f"{table}: {rows} rows from {stem} in {elapsed:.2f} s ({rate:.0f} rows/s)")
+    return rows, elapsed
+
+
+def load_dataset(driver, suffix=None, batch_size=BATCH_SIZE, clear=True):
+    """
+    Clears the graph (unless clear=False), creates the constraints, then loads Book and Borrower
+    nodes and BORROWED relationships from <table>_<suffix> (or <table> when suffix is None).
+    The node phases use CREATE, so loading into a graph that already holds the same ids fails
+    on the uniqueness constraints.
+    """
+    def stem(table):
+        return f"{table}_{suffix}" if suffix else table
+
+    with driver.session() as session:
+        if clear:
+            clear_graph(session)
+        create_constraints(session)
+        return {
+            "books": run_batches(session, BOOKS_QUERY, "books", stem("books"), batch_size),
+            "borrowers": run_batches(session, BORROWERS_QUERY, "borrowers", stem("borrowers"), batch_size),
+            "transactions": run_batches(session, BORROWED_QUERY, "transactions", stem("transactions"), batch_size),
+        }
@@ -0,0 +1,86 @@
+import sys
+
+import redis
+
+from redis_layout import scan_transactions
+from redis_scan import scan_records
+
+# Aggregates maintained at write time for Query2 and Query3:
+#   agg:book:popularity               ZSET book_id -> number of transactions (ZINCRBY per borrow)
+#   agg:genre:<genre>:borrower_counts HASH borrower_id -> transactions of that genre (HINCRBY per borrow)
+BOOK_POPULARITY = "agg:book:popularity"
+
+
+def genre_counts_key(genre):
+    return f"agg:genre:{genre}:borrower_counts"
+
+
+def aggregate_commands(book_id, borrower_id, genre):
+    """Commands that account for one new transaction; genre is the borrowed book's genre (None if unknown)."""
+    commands = [("ZINCRBY", BOOK_POPULARITY, 1, book_id)]
+    if genre is not None:
+        commands.append(("HINCRBY", genre_counts_key(genre), borrower_id, 1))
+    return commands
+
+
+def scan_aggregates(r):
+    """Recomputes both aggregates from the transaction and book hashes in one streaming scan."""
+    genres = {b.key.split(":")[1]: b.genre for b in scan_records(r, "book:*", ["genre"])}
+    popularity = {}
+    genre_counts = {}
+    for t in scan_transactions(r):
+        popularity[t.book_id] = popularity.get(t.book_id, 0) + 1
+        genre = genres.get(t.book_id)
+        if genre is not None:
+            counts = genre_counts.setdefault(genre, {})
+            counts[t.borrower_id] = counts.get(t.borrower_id, 0) + 1
+    return popularity, genre_counts
+
+
+def _maintained_genres(r):
+    return {key.decode().split(":")[2] for key in r.scan_iter("agg:genre:*:borrower_counts")}
+
+
+def verify_aggregates(r):
+    """Compares the maintained aggregates with a full scan. Returns a list of mismatch descriptions."""
+    popularity, genre_counts = scan_aggregates(r)
+    problems = []
+    stored = {k.decode(): int(v) for k, v in r.zrange(BOOK_POPULARITY, 0, -1, withscores=True)}
+    if stored != popularity:
+        diff = {k for k in set(stored) | set(popularity) if stored.get(k) != popularity.get(k)}
+        problems.append(f"{BOOK_POPULARITY}: {len(diff)} books differ")
+    for genre in sorted(set(genre_counts) | _maintained_genres(r)):
+        key = genre_counts_key(genre)
+        stored = {k.decode(): int(v) for k, v in r.hgetall(key).items()}
+        expected = genre_counts.get(genre, {})
+        if stored != expected:
+            diff = {k for k in set(stored) | set(expected) if stored.get(k) != expected.get(k)}
+            problems.append(f"{key}: {len(diff)} borrowers differ")
+    return problems
+
+
+def rebuild_aggregates(r):
+    """Replaces the maintained aggregates with freshly scanned values."""
+    popularity, genre_counts = scan_aggregates(r)
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(BOOK_POPULARITY, *[genre_counts_key(g) for g in _maintained_genres(r)])
+    if popularity:
+        pipe.zadd(BOOK_POPULARITY, popularity)
+    for genre, counts in genre_counts.items():
+        pipe.hset(genre_counts_key(genre), mapping=counts)
+    pipe.execute()
+
+
+if __name__ == "__main__":
+    # python redis_aggregates.py verify   -> report differences between maintained and scanned aggregates
+    # python redis_aggregates.py rebuild  -> recompute the aggregates from a full scan
+    action = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    r = redis.Redis(host="localhost", port=6379, db=0)
+    if action == "rebuild":
+        rebuild_aggregates(r)
+        print("Aggregates rebuilt.")
+    else:
+        problems = verify_aggregates(r)
+        for problem in problems:
+            print(problem)
+        print("Aggregates match a full scan." if not problems else f"{len(problems)} aggregate(s) out of date.")
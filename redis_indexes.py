@@ -0,0 +1,57 @@
+import datetime
+
+# Secondary index structures maintained by redis_loader next to the book/borrower/transaction hashes:
+#   idx:borrower:name                       ZSET, score 0, member "<lowercased name>\0<borrower_id>" (ZRANGEBYLEX prefix search)
+#   idx:borrower:<borrower_id>:transactions ZSET of transaction ids scored by borrow date (days since 1970-01-01)
+#   idx:transactions:by_date                ZSET of all transaction ids scored by borrow date
+#   idx:genre:<genre>                       SET of book ids
+BORROWER_NAME_INDEX = "idx:borrower:name"
+TRANSACTIONS_BY_DATE = "idx:transactions:by_date"
+
+_EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+
+def borrower_transactions_key(borrower_id):
+    return f"idx:borrower:{borrower_id}:transactions"
+
+
+def genre_key(genre):
+    return f"idx:genre:{genre}"
+
+
+def date_to_day(value):
+    """'YYYY-MM-DD' -> days since 1970-01-01 (the sorted-set score used for dates)."""
+    return datetime.date.fromisoformat(value).toordinal() - _EPOCH
+
+
+def borrower_name_member(name, borrower_id):
+    return f"{name.lower()}\0{borrower_id}"
+
+
+def member_borrower_id(member):
+    return (member.decode() if isinstance(member, bytes) else member).rsplit("\0", 1)[1]
+
+
+def prefix_range(prefix):
+    """ZRANGEBYLEX bounds matching every member that starts with prefix (case-insensitive)."""
+    start = prefix.lower().encode("utf-8")
+    # 0xff never occurs in UTF-8, so it sorts after every member sharing the prefix.
+    return b"[" + start, b"[" + start + b"\xff"
+
+
+# --- Index maintenance commands, added to each row's commands by redis_loader ---
+
+def book_index_commands(book_id, genre):
+    return [("SADD", genre_key(genre), book_id)]
+
+
+def borrower_index_commands(borrower_id, name):
+    return [("ZADD", BORROWER_NAME_INDEX, 0, borrower_name_member(name, borrower_id))]
+
+
+def transaction_index_commands(transaction_id, borrower_id, borrow_date):
+    day = date_to_day(borrow_date)
+    return [
+        ("ZADD", borrower_transactions_key(borrower_id), day, transaction_id),
+        ("ZADD", TRANSACTIONS_BY_DATE, day, transaction_id),
+    ]
@@ -0,0 +1,142 @@
+import datetime
+import struct
+from collections import namedtuple
+
+from redis_indexes import TRANSACTIONS_BY_DATE, date_to_day
+from redis_scan import FETCH_BATCH, SCAN_COUNT, scan_records
+
+# Storage layouts for transactions:
+#   "hash"   - one hash per transaction: transaction:<id> {book_id, borrower_id, borrow_date, return_date}
+#   "bucket" - BUCKET_SIZE transactions per hash: txb:<id // BUCKET_SIZE> {<id % BUCKET_SIZE>: packed}
+#              where packed is 16 bytes, little-endian uint32 book_id, borrower_id, borrow day, return day
+#              (days since 1970-01-01). With BUCKET_SIZE <= hash-max-listpack-entries (128 by default)
+#              Redis keeps each bucket listpack-encoded, so the per-key and per-field overhead is shared.
+# The loader records the layout in LAYOUT_KEY, and the readers below pick it up from there.
+LAYOUTS = ("hash", "bucket")
+LAYOUT_KEY = "meta:transaction_layout"
+BUCKET_SIZE = 128
+
+_PACKED = struct.Struct("<IIII")
+_EPOCH = datetime.date(1970, 1, 1).toordinal()
+
+Transaction = namedtuple("Transaction", ["transaction_id", "book_id", "borrower_id", "borrow_date", "return_date"])
+
+
+def bucket_key(transaction_id):
+    return f"txb:{int(transaction_id) // BUCKET_SIZE}"
+
+
+def bucket_field(transaction_id):
+    return int(transaction_id) % BUCKET_SIZE
+
+
+def day_to_date(day):
+    """Days since 1970-01-01 -> 'YYYY-MM-DD'."""
+    return datetime.date.fromordinal(day + _EPOCH).isoformat()
+
+
+def pack(book_id, borrower_id, borrow_date, return_date):
+    return _PACKED.pack(int(book_id), int(borrower_id), date_to_day(borrow_date), date_to_day(return_date))
+
+
+def unpack(transaction_id, value):
+    book_id, borrower_id, borrow_day, return_day = _PACKED.unpack(value)
+    return Transaction(str(transaction_id), str(book_id), str(borrower_id), day_to_date(borrow_day), day_to_date(return_day))
+
+
+def get_layout(r):
+    layout = r.get(LAYOUT_KEY)
+    return layout.decode() if layout is not None else "hash"
+
+
+def store_commands(row, layout="hash"):
+    """Commands that store one transaction row in the given layout."""
+    transaction_id, book_id, borrower_id, borrow_date, return_date = row
+    if layout == "bucket":
+        return [("HSET", bucket_key(transaction_id), bucket_field(transaction_id),
+                 pack(book_id, borrower_id, borrow_date, return_date))]
+    return [("HSET", f"transaction:{transaction_id}", "book_id", book_id, "borrower_id", borrower_id,
+             "borrow_date", borrow_date, "return_date", return_date)]
+
+
+def fetch_transactions(r, transaction_ids, batch=FETCH_BATCH):
+    """Yields a Transaction (all fields as str) for each id, in order, from either layout."""
+    layout = get_layout(r)
+    ids = list(transaction_ids)
+    for start in range(0, len(ids), batch):
+        chunk = ids[start:start + batch]
+        pipe = r.pipeline(transaction=False)
+        if layout == "bucket":
+            for tid in chunk:
+                pipe.hget(bucket_key(tid), bucket_field(tid))
+            for tid, value in zip(chunk, pipe.execute()):
+                if value is not None:
+                    yield unpack(tid, value)
+        else:
+            fields = Transaction._fields[1:]
+            for tid in chunk:
+                pipe.hmget(f"transaction:{tid}", fields)
+            for tid, values in zip(chunk, pipe.execute()):
+                if values[0] is not None:
+                    yield Transaction(str(tid), *(v.decode() for v in values))
+
+
+def scan_transactions(r, scan_count=SCAN_COUNT, batch=FETCH_BATCH):
+    """Streams every Transaction in the database, whichever layout it was loaded with."""
+    if get_layout(r) == "bucket":
+        keys = []
+        for key in r.scan_iter(match="txb:*", count=scan_count):
+            keys.append(key)
+            if len(keys) >= batch:
+                yield from _unpack_buckets(r, keys)
+                keys = []
+        yield from _unpack_buckets(r, keys)
+    else:
+        for t in scan_records(r, "transaction:*", Transaction._fields[1:], scan_count, batch):
+            yield Transaction(t.key.split(":")[1], *t[1:])
+
+
+def _unpack_buckets(r, keys):
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.hgetall(key)
+    for key, fields in zip(keys, pipe.execute()):
+        base = int(key.decode().split(":")[1]) * BUCKET_SIZE
+        for field, value in fields.items():
+            yield unpack(base + int(field), value)
+
+
+def memory_report(r, sample_transaction_id=None):
+    """
+    Prints INFO memory totals and MEMORY USAGE for one transaction key of the active layout
+    (per transaction for the bucket layout). The sample defaults to the first transaction in the
+    date index. Returns the numbers as a dict, with None for the sample when its key is missing.
+    """
+    layout = get_layout(r)
+    info = r.info("memory")
+    if sample_transaction_id is None:
+        first = r.zrange(TRANSACTIONS_BY_DATE, 0, 0)
+        sample_transaction_id = first[0].decode() if first else None
+    key = None
+    key_bytes = per_transaction = None
+    if sample_transaction_id is not None:
+        key = bucket_key(sample_transaction_id) if layout == "bucket" else f"transaction:{sample_transaction_id}"
+        key_bytes = r.memory_usage(key)
+    if key_bytes is not None:
+        per_transaction = key_bytes / max(r.hlen(key), 1) if layout == "bucket" else key_bytes
+    report = {
+        "layout": layout,
+        "used_memory": info.get("used_memory"),
+        "used_memory_dataset": info.get("used_memory_dataset"),
+        "sample_key": key,
+        "sample_key_bytes": key_bytes,
+        "bytes_per_transaction": per_transaction,
+    }
+    print(f"Memory ({layout} layout): used_memory {info.get('used_memory_human')}, "
+          f"dataset {info.get('used_memory_dataset')} bytes")
+    if key_bytes is None:
+        missing = f"sample key {key} does not exist" if key else "no transactions in the date index"
+        print(f"Warning: {missing}; per-transaction memory not reported")
+    else:
+        print(f"  MEMORY USAGE {key} = {key_bytes} bytes (~{per_transaction:.1f} bytes per transaction)")
+    return report
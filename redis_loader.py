@@ -0,0 +1,226 @@
+import sys
+import time
+from functools import partial
+
+import redis
+
+from columnar import load_rows
+from redis_indexes import book_index_commands, borrower_index_commands, transaction_index_commands
+from redis_aggregates import aggregate_commands, rebuild_aggregates
+from redis_layout import LAYOUT_KEY, get_layout, store_commands
+
+# Commands queued per pipeline before it is flushed to the server.
+PIPELINE_SIZE = 10_000
+
+# Print a progress line every this many rows.
+PROGRESS_EVERY = 100_000
+
+TABLES = ["books", "borrowers", "transactions"]
+
+
+# --- Row -> command builders ---
+# Each builder returns the Redis commands (as argument tuples) that store one row together with
+# its secondary index entries (see redis_indexes.py) and, for transactions, the aggregate updates
+# (see redis_aggregates.py). Both load modes consume the same commands, so they always produce the
+# same keyspace.
+
+def book_commands(row):
+    book_id, title, author, year, genre = row
+    return [("HSET", f"book:{book_id}", "title", title, "author", author, "year", year, "genre", genre),
+            *book_index_commands(book_id, genre)]
+
+
+def borrower_commands(row):
+    borrower_id, name, email = row
+    return [("HSET", f"borrower:{borrower_id}", "name", name, "email", email),
+            *borrower_index_commands(borrower_id, name)]
+
+
+def transaction_commands(row, genres, layout="hash"):
+    """
+    genres maps book_id -> genre, so the per-genre counters can be bumped without a read.
+    layout selects the transaction storage layout (see redis_layout.py).
+    """
+    transaction_id, book_id, borrower_id, borrow_date, _ = row
+    return [*store_commands(row, layout),
+            *transaction_index_commands(transaction_id, borrower_id, borrow_date),
+            *aggregate_commands(book_id, borrower_id, genres.get(book_id))]
+
+
+command_builders = {
+    "books": book_commands,
+    "borrowers": borrower_commands,
+    "transactions": transaction_commands,
+}
+
+
+def stem_of(table, suffix):
+    return f"{table}_{suffix}" if suffix else table
+
+
+def load_genres(suffix):
+    """book_id -> genre for the books being loaded (needed by the transaction aggregates)."""
+    return {row[0]: row[4] for batch in load_rows(stem_of("books", suffix), table="books") for row in batch}
+
+
+def table_commands(table, stem, genres=None, layout="hash"):
+    """Yields (row_done, command) pairs; row_done is True on the last command of each row."""
+    build = command_builders[table]
+    if table == "transactions":
+        build = partial(transaction_commands, genres=genres or {}, layout=layout)
+    for batch in load_rows(stem, table=table):
+        for row in batch:
+            commands = build(row)
+            for i, command in enumerate(commands):
+                yield i == len(commands) - 1, command
+
+
+class Progress:
+    """Prints rows and rows/s for one table every PROGRESS_EVERY rows, and a final summary."""
+
+    def __init__(self, table, out=sys.stdout):
+        self.table = table
+        self.out = out
+        self.rows = 0
+        self.commands = 0
+        self.start = time.time()
+
+    def step(self, row_done):
+        self.commands += 1
+        if row_done:
+            self.rows += 1
+            if self.rows % PROGRESS_EVERY == 0:
+                self.report("progress")
+
+    def report(self, label="done"):
+        elapsed = time.time() - self.start
+        rate = self.rows / elapsed if elapsed > 0 else float("inf")
+        print(f"{self.table} {label}: {self.rows} rows, {self.commands} commands in {elapsed:.2f} s "
+              f"({rate:.0f} rows/s)", file=self.out)
+        return self.rows, elapsed
+
+
+# --- Pipelined mode ---
+
+def load_pipelined(r, suffix=None, pipeline_size=PIPELINE_SIZE, flush=True, layout="hash"):
+    """
+    Loads the dataset through non-transactional pipelines flushed every pipeline_size commands.
+    Without flush, the aggregates are rebuilt from a full scan afterwards: their ZINCRBY/HINCRBY
+    updates are not idempotent, so transactions that were already loaded would be counted twice.
+    Returns {table: (rows, seconds)}.
+    """
+    if flush:
+        r.flushdb()
+        print("Redis database cleared.")
+    r.set(LAYOUT_KEY, layout)
+    genres = load_genres(suffix)
+    stats = {}
+    for table in TABLES:
+        progress = Progress(table)
+        pipe = r.pipeline(transaction=False)
+        queued = 0
+        for row_done, command in table_commands(table, stem_of(table, suffix), genres, layout):
+            pipe.execute_command(*command)
+            queued += 1
+            progress.step(row_done)
+            if queued >= pipeline_size:
+                pipe.execute()
+                queued = 0
+        if queued:
+            pipe.execute()
+        stats[table] = progress.report()
+    if not flush:
+        start = time.time()
+        rebuild_aggregates(r)
+        print(f"Aggregates rebuilt from a full scan in {time.time() - start:.2f} s (database was not flushed).")
+    return stats
+
+
+def record_borrow(r, transaction_id, book_id, borrower_id, borrow_date, return_date):
+    """
+    Write path for a single new borrow: stores the transaction, its index entries and the
+    aggregate updates in one MULTI/EXEC, so readers never see the counters out of step.
+    """
+    genre = r.hget(f"book:{book_id}", "genre")
+    genres = {book_id: genre.decode()} if genre is not None else {}
+    layout = get_layout(r)
+    pipe = r.pipeline(transaction=True)
+    row = (transaction_id, book_id, borrower_id, borrow_date, return_date)
+    for command in transaction_commands(row, genres, layout):
+        pipe.execute_command(*command)
+    pipe.execute()
+
+
+# --- Mass-insert mode ---
+
+def _arg_bytes(arg):
+    return arg if isinstance(arg, bytes) else str(arg).encode("utf-8")
+
+
+def encode_resp(command):
+    """Encodes one command as a RESP array of bulk strings, as expected by `redis-cli --pipe`."""
+    parts = [b"*%d\r\n" % len(command)]
+    for arg in command:
+        data = _arg_bytes(arg)
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+def write_resp(stream, suffix=None, flush=True, layout="hash"):
+    """
+    Writes the whole dataset as raw RESP to a binary stream, e.g.
+        python redis_loader.py > load.resp && redis-cli --pipe < load.resp
+    Progress goes to stderr so stdout can be piped straight into redis-cli. Without flush, the
+    stream's aggregate increments double-count transactions the database already holds; run
+    `python redis_aggregates.py rebuild` after piping it.
+    Returns {table: (rows, seconds)}.
+    """
+    if flush:
+        stream.write(encode_resp(("FLUSHDB",)))
+    stream.write(encode_resp(("SET", LAYOUT_KEY, layout)))
+    genres = load_genres(suffix)
+    stats = {}
+    buffer = []
+    for table in TABLES:
+        progress = Progress(table, out=sys.stderr)
+        for row_done, command in table_commands(table, stem_of(table, suffix), genres, layout):
+            buffer.append(encode_resp(command))
+            progress.step(row_done)
+            if len(buffer) >= PIPELINE_SIZE:
+                stream.write(b"".join(buffer))
+                buffer = []
+        stream.write(b"".join(buffer))
+        buffer = []
+        stats[table] = progress.report()
+    stream.flush()
+    if not flush:
+        print("Stream written without FLUSHDB: run `python redis_aggregates.py rebuild` after loading it.",
+              file=sys.stderr)
+    return stats
+
+
+def load_dataset(r, suffix=None, mode="pipeline", pipeline_size=PIPELINE_SIZE, resp_output="-", layout="hash",
+                 flush=False):
+    """
+    mode="pipeline" loads through r; mode="resp" writes a mass-insert stream to resp_output
+    ("-" for stdout) for `redis-cli --pipe`. layout is "hash" or "bucket" (see redis_layout.py).
+    With flush=True the database is emptied first (FLUSHDB, also written at the start of the stream).
+    """
+    if mode == "pipeline":
+        return load_pipelined(r, suffix, pipeline_size, flush=flush, layout=layout)
+    if mode == "resp":
+        if resp_output == "-":
+            return write_resp(sys.stdout.buffer, suffix, flush=flush, layout=layout)
+        with open(resp_output, "wb") as f:
+            return write_resp(f, suffix, flush=flush, layout=layout)
+    raise ValueError(f"Unknown load mode {mode!r}; expected 'pipeline' or 'resp'")
+
+
+if __name__ == "__main__":
+    suffix = "25"      # "25", "50", "75", "100", or None for the full books/borrowers/transactions files
+    mode = "pipeline"  # "pipeline", or "resp" to write a stream for: redis-cli --pipe < load.resp
+    resp_output = "load.resp"
+    layout = "hash"    # "hash" (transaction:<id>) or "bucket" (packed txb:<id // 128> hashes)
+    flush = False      # True to FLUSHDB before loading
+    r = redis.Redis(host="localhost", port=6379, db=0)
+    load_dataset(r, suffix, mode, resp_output=resp_output, layout=layout, flush=flush)
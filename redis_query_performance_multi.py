@@ -1,7 +1,13 @@
 import time
 import statistics
-import redis
-import csv
+import connections
+import consumption
+import redis_loader
+import redis_indexes
+import redis_aggregates
+import redis_scripts
+import redis_scan
+import redis_layout
 
 # Set dataset size label (e.g., "250k", "500k", "750k", or "1000k")
 dataset_size = "250k"  # Change as needed
@@ -14,6 +20,23 @@ csv_mapping = {
     "1000k": "100"
 }
 
+# Commands per pipeline flush when loading
+load_pipeline_size = 10000
+
+# Transaction storage: "hash" (one transaction:<id> hash each) or "bucket" (packed values in txb:<id // 128> hashes)
+transaction_layout = "hash"
+
+# "client" runs the joins/aggregations in Python over the indexes; "server" runs Query2-Query4 as Lua
+# scripts inside Redis; "scan" ignores the indexes and streams the whole keyspace (redis_scan)
+execution_mode = "client"
+
+# Query4 result consumption compared after the timed runs (see consumption.py): "materialize" builds
+# the whole history list, as the timed runs do; "stream" yields the joined rows one borrower at a
+# time. Grouping by borrower still needs every qualifying transaction, so streaming only saves the
+# result list. Uses the client or scan form of Query4. Peak client memory is traced per mode
+# (consumption.traced_peak_mb).
+consumption_modes = ["stream", "materialize"]
+
 def load_data_from_csv(dataset_size, r):
     """
     Clears the Redis database and loads data from CSV subset files.
@@ -21,121 +44,106 @@ def load_data_from_csv(dataset_size, r):
       - books_<suffix>.csv
       - borrowers_<suffix>.csv
       - transactions_<suffix>.csv
+    Rows are written through non-transactional pipelines flushed every load_pipeline_size commands.
     """
     suffix = csv_mapping.get(dataset_size, "25")
     print(f"Dataset size is: {dataset_size} and suffix is: {suffix}")
-    # Clear the database
-    r.flushdb()
-    print("Redis database cleared.")
-    
-    books_file = f"books_{suffix}.csv"
-    borrowers_file = f"borrowers_{suffix}.csv"
-    transactions_file = f"transactions_{suffix}.csv"
-    
-    # Load Books
-    with open(books_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            key = f"book:{row['book_id']}"
-            r.hset(key, mapping=row)
-    print(f"Books loaded from {books_file}.")
-    
-    # Load Borrowers
-    with open(borrowers_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            key = f"borrower:{row['borrower_id']}"
-            r.hset(key, mapping=row)
-    print(f"Borrowers loaded from {borrowers_file}.")
-    
-    # Load Transactions
-    with open(transactions_file, 'r') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            key = f"transaction:{row['transaction_id']}"
-            r.hset(key, mapping=row)
-    print(f"Transactions loaded from {transactions_file}.")
+    redis_loader.load_pipelined(r, suffix, pipeline_size=load_pipeline_size, layout=transaction_layout)
+    redis_layout.memory_report(r)
 
 # Prompt the user for a borrower name pattern for Query1 (e.g., "J" for names starting with J)
 name_pattern = input("Enter the borrower name pattern (e.g., 'J' for names starting with J): ")
 
 # Define Query Functions for Redis.
+# The queries read the secondary indexes maintained by redis_loader (see redis_indexes.py) and fetch
+# only the hash fields they need in pipelined, decoded batches (redis_scan.fetch_fields), so their
+# cost follows the result size rather than the keyspace size.
+
+def fetch(prefix, ids, *fields):
+    """Streams (key, *fields) records for prefix:<id> keys in pipelined batches."""
+    return redis_scan.fetch_fields(r, (f"{prefix}:{i}" for i in ids), fields)
+
 # Query1: Retrieve borrower names whose names start with the given pattern.
 def redis_query1():
-    matching = []
-    for key in r.scan_iter("borrower:*"):
-        borrower = r.hgetall(key)
-        name = borrower.get(b'name', b'').decode()
-        if name.lower().startswith(name_pattern.lower()):
-            matching.append(name)
-    return sorted(matching)
+    low, high = redis_indexes.prefix_range(name_pattern)
+    members = r.zrangebylex(redis_indexes.BORROWER_NAME_INDEX, low, high)
+    ids = [redis_indexes.member_borrower_id(m) for m in members]
+    return sorted(b.name for b in fetch("borrower", ids, "name") if b.name is not None)
 
 # Query2: Retrieve list of borrowers with count of Fiction books they've borrowed.
+# The per-borrower Fiction counts are maintained by the loader (redis_aggregates), so this is one hash read.
 def redis_query2():
-    book_genre_cache = {}
-    def get_book_genre(book_id):
-        if book_id in book_genre_cache:
-            return book_genre_cache[book_id]
-        book = r.hgetall(f"book:{book_id}")
-        genre = book.get(b'genre', b'').decode() if book else None
-        book_genre_cache[book_id] = genre
-        return genre
-
-    fiction_counts = {}
-    for tkey in r.scan_iter("transaction:*"):
-        trans = r.hgetall(tkey)
-        borrower_id = trans.get(b'borrower_id', b'').decode()
-        book_id = trans.get(b'book_id', b'').decode()
-        if get_book_genre(book_id) == "Fiction":
-            fiction_counts[borrower_id] = fiction_counts.get(borrower_id, 0) + 1
-
-    results = []
-    for bkey in r.scan_iter("borrower:*"):
-        borrower = r.hgetall(bkey)
-        borrower_id = bkey.decode().split(":")[1]
-        name = borrower.get(b'name', b'').decode()
-        count = fiction_counts.get(borrower_id, 0)
-        results.append((name, count))
-    return results
+    fiction_counts = {k.decode(): int(v) for k, v in r.hgetall(redis_aggregates.genre_counts_key("Fiction")).items()}
+    members = r.zrange(redis_indexes.BORROWER_NAME_INDEX, 0, -1)
+    ids = [redis_indexes.member_borrower_id(m) for m in members]
+    return [(b.name or '', fiction_counts.get(bid, 0)) for bid, b in zip(ids, fetch("borrower", ids, "name"))]
 
 # Query3: Retrieve top 5 most popular books based on borrowing frequency.
+# Reads the popularity sorted set maintained by the loader.
 def redis_query3():
-    freq = {}
-    for tkey in r.scan_iter("transaction:*"):
-        trans = r.hgetall(tkey)
-        book_id = trans.get(b'book_id', b'').decode()
-        freq[book_id] = freq.get(book_id, 0) + 1
-    top5 = sorted(freq.items(), key=lambda x: x[1], reverse=True)[:5]
-    results = []
-    for book_id, count in top5:
-        book = r.hgetall(f"book:{book_id}")
-        title = book.get(b'title', b'').decode() if book else "Unknown"
-        results.append((title, count))
-    return results
+    top5 = r.zrevrange(redis_aggregates.BOOK_POPULARITY, 0, 4, withscores=True)
+    books = fetch("book", (book_id.decode() for book_id, _ in top5), "title")
+    return [(b.title or "Unknown", int(count)) for b, (_, count) in zip(books, top5)]
 
 # Query4: Retrieve detailed borrowing history for borrowers who have borrowed more than 2 books since '2022-01-01'.
 def redis_query4():
+    return history_rows(recent_transactions())
+
+def recent_transactions():
+    """Streams the transactions borrowed since 2022-01-01, found through the date index."""
+    since = redis_indexes.date_to_day("2022-01-01")
+    tids = (tid.decode() for tid in r.zrangebyscore(redis_indexes.TRANSACTIONS_BY_DATE, since, "+inf"))
+    return redis_layout.fetch_transactions(r, tids)
+
+def history_rows(transactions):
+    """Shared tail of Query4: keeps borrowers with more than 2 of the given transactions and joins names/titles."""
+    return list(iter_history_rows(transactions))
+
+def iter_history_rows(transactions):
+    """Yields history_rows' rows, one borrower at a time."""
     borrower_history = {}
-    for tkey in r.scan_iter("transaction:*"):
-        trans = r.hgetall(tkey)
-        borrow_date = trans.get(b'borrow_date', b'').decode()
-        if borrow_date >= "2022-01-01":
-            borrower_id = trans.get(b'borrower_id', b'').decode()
-            borrower_history.setdefault(borrower_id, []).append(tkey.decode())
-    results = []
-    for borrower_id, tkeys in borrower_history.items():
-        if len(tkeys) > 2:
-            borrower = r.hgetall(f"borrower:{borrower_id}")
-            name = borrower.get(b'name', b'').decode() if borrower else "Unknown"
-            for tkey in tkeys:
-                trans = r.hgetall(tkey)
-                book_id = trans.get(b'book_id', b'').decode()
-                book = r.hgetall(f"book:{book_id}")
-                title = book.get(b'title', b'').decode() if book else "Unknown"
-                borrow_date = trans.get(b'borrow_date', b'').decode()
-                return_date = trans.get(b'return_date', b'').decode()
-                results.append((name, title, borrow_date, return_date))
-    return results
+    for t in transactions:
+        borrower_history.setdefault(t.borrower_id, []).append(t)
+    eligible = {bid: history for bid, history in borrower_history.items() if len(history) > 2}
+
+    names = {bid: b.name for bid, b in zip(eligible, fetch("borrower", eligible, "name"))}
+    book_ids = sorted({t.book_id for history in eligible.values() for t in history})
+    titles = {book_id: b.title for book_id, b in zip(book_ids, fetch("book", book_ids, "title"))}
+
+    for borrower_id, history in eligible.items():
+        name = names[borrower_id] or "Unknown"
+        for t in history:
+            yield name, titles[t.book_id] or "Unknown", t.borrow_date, t.return_date
+
+# Scan-based forms of the queries: no indexes or aggregates, just one streaming pass over the
+# keyspace with large SCAN COUNT hints and pipelined HMGETs (redis_scan.scan_records).
+def redis_scan_query1():
+    prefix = name_pattern.lower()
+    return sorted(b.name for b in redis_scan.scan_records(r, "borrower:*", ["name"])
+                  if (b.name or '').lower().startswith(prefix))
+
+def redis_scan_query2():
+    genres = {b.key.split(":")[1]: b.genre for b in redis_scan.scan_records(r, "book:*", ["genre"])}
+    fiction_counts = {}
+    for t in redis_layout.scan_transactions(r):
+        if genres.get(t.book_id) == "Fiction":
+            fiction_counts[t.borrower_id] = fiction_counts.get(t.borrower_id, 0) + 1
+    return [(b.name or '', fiction_counts.get(b.key.split(":")[1], 0))
+            for b in redis_scan.scan_records(r, "borrower:*", ["name"])]
+
+def redis_scan_query3():
+    freq = {}
+    for t in redis_layout.scan_transactions(r):
+        freq[t.book_id] = freq.get(t.book_id, 0) + 1
+    top5 = sorted(freq.items(), key=lambda x: x[1], reverse=True)[:5]
+    books = fetch("book", (book_id for book_id, _ in top5), "title")
+    return [(b.title or "Unknown", count) for b, (_, count) in zip(books, top5)]
+
+def redis_scan_query4():
+    return history_rows(scan_recent_transactions())
+
+def scan_recent_transactions():
+    return (t for t in redis_layout.scan_transactions(r) if t.borrow_date >= "2022-01-01")
 
 # Mapping of query names to their functions.
 queries = {
@@ -145,6 +153,28 @@ queries = {
     "Query4": redis_query4
 }
 
+scan_queries = {
+    "Query1": redis_scan_query1,
+    "Query2": redis_scan_query2,
+    "Query3": redis_scan_query3,
+    "Query4": redis_scan_query4
+}
+
+def server_side_queries():
+    """Query2-Query4 as Lua scripts executed inside Redis (redis_scripts); Query1 stays client-side."""
+    server = redis_scripts.ServerQueries(r)
+    return {
+        "Query1": redis_query1,
+        "Query2": server.query2,
+        "Query3": server.query3,
+        "Query4": server.query4
+    }
+
+def query4_rows(mode):
+    """Query4's history rows: a list with mode "materialize", a generator with mode "stream"."""
+    rows = iter_history_rows(scan_recent_transactions() if execution_mode == "scan" else recent_transactions())
+    return list(rows) if mode == "materialize" else rows
+
 def measure_redis_query(query_func):
     times = []
     # Cold run.
@@ -165,14 +195,22 @@ def measure_redis_query(query_func):
 if __name__ == "__main__":
     print(f"Dataset Size: {dataset_size}")
     
-    # Connect to Redis.
-    r = redis.Redis(host="localhost", port=6379, db=0)
+    # Connect to Redis through the shared, pre-warmed pool (see connections.py).
+    r = connections.redis_client()
+    connections.handshake_report()
     
     # Load data from the appropriate CSV subset into Redis.
     load_data_from_csv(dataset_size, r)
     
     # Run performance tests for each query.
-    for query_name, func in queries.items():
+    if execution_mode == "server":
+        selected = server_side_queries()
+    elif execution_mode == "scan":
+        selected = scan_queries
+    else:
+        selected = queries
+    print(f"Execution mode: {execution_mode}")
+    for query_name, func in selected.items():
         print(f"\nRunning {query_name}...")
         first_time, avg_time, conf_interval = measure_redis_query(func)
         print(f"{query_name} Performance:")
@@ -180,8 +218,16 @@ if __name__ == "__main__":
         print(f"  Average Execution Time: {avg_time:.2f} ms")
         print(f"  95% Confidence Interval: ±{conf_interval:.2f} ms")
     
+    # Materialized vs streamed consumption of Query4's result
+    print()
+    for mode in consumption_modes:
+        stats = consumption.measure_consumption(lambda: consumption.consume(lambda: query4_rows(mode)))
+        consumption.print_consumption("Query4", mode, stats)
+
     # After all queries have been executed, run Query1 again to print the matching borrower names.
     results = redis_query1()
     print(f"\nBorrowers whose names start with '{name_pattern}':")
     for name in results:
         print(name)
+
+    connections.close_all()
@@ -0,0 +1,71 @@
+import weakref
+from collections import namedtuple
+from functools import lru_cache
+
+import redis
+
+# COUNT hint passed to SCAN: how many slots the server walks per call (fewer round trips than the default 10).
+SCAN_COUNT = 5000
+
+# Keys whose fields are fetched per pipelined round trip.
+FETCH_BATCH = 1000
+
+_decoding_clients = weakref.WeakKeyDictionary()
+
+
+@lru_cache(maxsize=None)
+def _record_type(fields):
+    return namedtuple("Record", ("key",) + fields)
+
+
+def decoding_client(r):
+    """A client on the same server as r that returns str instead of bytes (decode_responses=True)."""
+    pool = r.connection_pool
+    if pool.connection_kwargs.get("decode_responses"):
+        return r
+    if r not in _decoding_clients:
+        kwargs = dict(pool.connection_kwargs, decode_responses=True)
+        decoded_pool = redis.ConnectionPool(connection_class=pool.connection_class, **kwargs)
+        _decoding_clients[r] = redis.Redis(connection_pool=decoded_pool)
+    return _decoding_clients[r]
+
+
+def register_decoding_client(r, decoded):
+    """Makes decoding_client(r) return decoded, e.g. a pooled, pre-warmed client (see connections.py)."""
+    _decoding_clients[r] = decoded
+
+
+def scan_records(r, pattern, fields, scan_count=SCAN_COUNT, batch=FETCH_BATCH):
+    """
+    Yields one lightweight record (key, *fields) per key matching pattern, with values already
+    decoded to str. Keys come from SCAN with a large COUNT hint, and only the requested fields are
+    fetched, with one pipelined HMGET round trip per batch of keys. Nothing is materialized beyond
+    the current batch, so callers can aggregate in a single streaming pass.
+    """
+    client = decoding_client(r)
+    record = _record_type(tuple(fields))
+    keys = []
+    for key in client.scan_iter(match=pattern, count=scan_count):
+        keys.append(key)
+        if len(keys) >= batch:
+            yield from _fetch(client, keys, fields, record)
+            keys = []
+    if keys:
+        yield from _fetch(client, keys, fields, record)
+
+
+def _fetch(client, keys, fields, record):
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.hmget(key, fields)
+    for key, values in zip(keys, pipe.execute()):
+        yield record(key, *values)
+
+
+def fetch_fields(r, keys, fields, batch=FETCH_BATCH):
+    """Like scan_records, but for a known list of keys (e.g. ids read from an index)."""
+    client = decoding_client(r)
+    record = _record_type(tuple(fields))
+    keys = list(keys)
+    for start in range(0, len(keys), batch):
+        yield from _fetch(client, keys[start:start + batch], fields, record)
@@ -0,0 +1,145 @@
+from redis_indexes import BORROWER_NAME_INDEX, TRANSACTIONS_BY_DATE, date_to_day
+from redis_layout import BUCKET_SIZE, LAYOUT_KEY, day_to_date
+
+# Server-side versions of the aggregation queries. Each script does the joins, filters and counts
+# next to the data (reading the hashes and the redis_indexes structures) and returns only the final
+# rows as a flat array. The scripts run atomically, so they block other clients while they run.
+# Keys are passed explicitly, but the scripts also read the book:/borrower:/transaction: hashes
+# they discover, so they are meant for a standalone (non-cluster) server.
+
+# Prepended to every script: reads one transaction from either storage layout (see redis_layout.py).
+# KEYS[2] is the layout key. Returns borrower_id, book_id, borrow_date, return_date; with the bucket
+# layout the dates are day numbers, which the Python side turns back into ISO dates.
+TRANSACTION_READER = """
+local bucket_layout = redis.call('GET', KEYS[2]) == 'bucket'
+local function u32(s, i)
+    local a, b, c, d = string.byte(s, i, i + 3)
+    return a + b * 256 + c * 65536 + d * 16777216
+end
+local function read_transaction(tid)
+    if bucket_layout then
+        local n = tonumber(tid)
+        local v = redis.call('HGET', 'txb:' .. math.floor(n / %(bucket)d), n %% %(bucket)d)
+        return u32(v, 5), u32(v, 1), u32(v, 9), u32(v, 13)
+    end
+    local t = redis.call('HMGET', 'transaction:' .. tid, 'borrower_id', 'book_id', 'borrow_date', 'return_date')
+    return t[1], t[2], t[3], t[4]
+end
+""" % {"bucket": BUCKET_SIZE}
+
+# KEYS[1] = borrower name index, ARGV[1] = genre
+# Returns name1, count1, name2, count2, ...
+QUERY2_GENRE_COUNTS = """
+local genres = {}
+local out = {}
+for _, member in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local borrower_id = string.match(member, '%z(%d+)$')
+    local count = 0
+    for _, tid in ipairs(redis.call('ZRANGE', 'idx:borrower:' .. borrower_id .. ':transactions', 0, -1)) do
+        local _, book_id = read_transaction(tid)
+        local genre = genres[book_id]
+        if genre == nil then
+            genre = redis.call('HGET', 'book:' .. book_id, 'genre') or false
+            genres[book_id] = genre
+        end
+        if genre == ARGV[1] then
+            count = count + 1
+        end
+    end
+    out[#out + 1] = redis.call('HGET', 'borrower:' .. borrower_id, 'name') or ''
+    out[#out + 1] = count
+end
+return out
+"""
+
+# KEYS[1] = transactions-by-date index, ARGV[1] = number of books to return
+# Returns title1, count1, ... for the most borrowed books.
+QUERY3_TOP_BOOKS = """
+local freq = {}
+for _, tid in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local _, book_id = read_transaction(tid)
+    freq[book_id] = (freq[book_id] or 0) + 1
+end
+local books = {}
+for book_id, count in pairs(freq) do
+    books[#books + 1] = {book_id, count}
+end
+table.sort(books, function(a, b) return a[2] > b[2] end)
+local out = {}
+for i = 1, math.min(tonumber(ARGV[1]), #books) do
+    out[#out + 1] = redis.call('HGET', 'book:' .. books[i][1], 'title') or 'Unknown'
+    out[#out + 1] = books[i][2]
+end
+return out
+"""
+
+# KEYS[1] = transactions-by-date index, ARGV[1] = first borrow day (days since 1970-01-01),
+# ARGV[2] = minimum number of transactions in the window (exclusive)
+# Returns name, title, borrow_date, return_date repeated for every qualifying transaction.
+QUERY4_ACTIVE_HISTORY = """
+local history = {}
+local order = {}
+for _, tid in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], ARGV[1], '+inf')) do
+    local t = {read_transaction(tid)}
+    local rows = history[t[1]]
+    if rows == nil then
+        rows = {}
+        history[t[1]] = rows
+        order[#order + 1] = t[1]
+    end
+    rows[#rows + 1] = t
+end
+local titles = {}
+local out = {}
+for _, borrower_id in ipairs(order) do
+    local rows = history[borrower_id]
+    if #rows > tonumber(ARGV[2]) then
+        local name = redis.call('HGET', 'borrower:' .. borrower_id, 'name') or 'Unknown'
+        for _, t in ipairs(rows) do
+            local title = titles[t[2]]
+            if title == nil then
+                title = redis.call('HGET', 'book:' .. t[2], 'title') or 'Unknown'
+                titles[t[2]] = title
+            end
+            out[#out + 1] = name
+            out[#out + 1] = title
+            out[#out + 1] = t[3]
+            out[#out + 1] = t[4]
+        end
+    end
+end
+return out
+"""
+
+
+def _as_date(value):
+    return day_to_date(value) if isinstance(value, int) else value
+
+
+def _chunks(values, size):
+    return [tuple(v.decode() if isinstance(v, bytes) else v for v in values[i:i + size])
+            for i in range(0, len(values), size)]
+
+
+class ServerQueries:
+    """
+    Registers the scripts once (EVALSHA, reloaded automatically on NOSCRIPT) and exposes
+    the server-side forms of Query2-Query4 with the same return shapes as the client-side ones.
+    """
+
+    def __init__(self, r):
+        self.r = r
+        self._query2 = r.register_script(TRANSACTION_READER + QUERY2_GENRE_COUNTS)
+        self._query3 = r.register_script(TRANSACTION_READER + QUERY3_TOP_BOOKS)
+        self._query4 = r.register_script(TRANSACTION_READER + QUERY4_ACTIVE_HISTORY)
+
+    def query2(self, genre="Fiction"):
+        return _chunks(self._query2(keys=[BORROWER_NAME_INDEX, LAYOUT_KEY], args=[genre]), 2)
+
+    def query3(self, limit=5):
+        return _chunks(self._query3(keys=[TRANSACTIONS_BY_DATE, LAYOUT_KEY], args=[limit]), 2)
+
+    def query4(self, since="2022-01-01", min_count=2):
+        rows = _chunks(self._query4(keys=[TRANSACTIONS_BY_DATE, LAYOUT_KEY], args=[date_to_day(since), min_count]), 4)
+        return [(name, title, _as_date(borrow_date), _as_date(return_date))
+                for name, title, borrow_date, return_date in rows]